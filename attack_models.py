@@ -1,18 +1,19 @@
-import random
-import config
+from config import SimulationConfig
 
 class AttackModels:
-    def __init__(self, peers, trust, content):
+    def __init__(self, peers, trust, content, cfg=None, rng=None):
         self.peers = peers
         self.trust = trust
         self.content = content
+        self.cfg = cfg or SimulationConfig()
+        self.rng = rng or self.cfg.make_rngs().attacks
 
     def ddos_burst(self, malicious_id):
         p = self.peers[malicious_id]
         if not p.is_malicious():
             return
         targets = list(p.neighbors)
-        random.shuffle(targets)
+        self.rng.shuffle(targets)
         for t in targets[:3]:
             self.trust.corrupt(malicious_id)
 
@@ -20,7 +21,7 @@ class AttackModels:
         p = self.peers[malicious_id]
         if not p.is_malicious():
             return
-        pid = random.choice(self.content.get_all_ids())
+        pid = self.rng.choice(self.content.get_all_ids())
         self.content.poison_piece(pid)
         self.trust.corrupt(malicious_id)
 
@@ -28,9 +29,9 @@ class AttackModels:
         p = self.peers[snooper_id]
         if not p.is_snooper():
             return
-        if random.random() < 0.6:
+        if self.rng.random() < 0.6:
             self.trust.snoop(snooper_id)
 
     def adaptive_probe(self, pid):
-        if random.random() < 0.15:
+        if self.rng.random() < 0.15:
             self.trust.accident(pid)
@@ -0,0 +1,80 @@
+import numpy as np
+
+class PieceAvailability:
+    # One packed bitfield row per peer (np.packbits bit order) plus a global
+    # holder count per piece.
+    def __init__(self, n_peers, n_pieces):
+        self.n_pieces = n_pieces
+        self.bits = np.zeros((n_peers, (n_pieces + 7) // 8), dtype=np.uint8)
+        self.counts = np.zeros(n_pieces, dtype=np.int64)
+
+    def add(self, pid, piece):
+        byte, mask = piece >> 3, 0x80 >> (piece & 7)
+        if self.bits[pid, byte] & mask:
+            return False
+        self.bits[pid, byte] |= mask
+        self.counts[piece] += 1
+        return True
+
+    def remove(self, pid, piece):
+        byte, mask = piece >> 3, 0x80 >> (piece & 7)
+        if not self.bits[pid, byte] & mask:
+            return False
+        self.bits[pid, byte] &= ~mask & 0xFF
+        self.counts[piece] -= 1
+        return True
+
+    def clear(self, pid):
+        self.counts -= self.held(pid)
+        self.bits[pid] = 0
+
+    def has(self, pid, piece):
+        return bool(self.bits[pid, piece >> 3] & (0x80 >> (piece & 7)))
+
+    def has_many(self, pids, pieces):
+        masks = (0x80 >> (pieces & 7)).astype(np.uint8)
+        return (self.bits[pids, pieces >> 3] & masks) != 0
+
+    def add_many(self, pids, pieces):
+        masks = (0x80 >> (pieces & 7)).astype(np.uint8)
+        new = (self.bits[pids, pieces >> 3] & masks) == 0
+        keys = np.unique(pids[new] * self.n_pieces + pieces[new])
+        np.bitwise_or.at(self.bits, (pids, pieces >> 3), masks)
+        np.add.at(self.counts, keys % self.n_pieces, 1)
+        return keys.size
+
+    def held(self, pid):
+        return np.unpackbits(self.bits[pid], count=self.n_pieces).astype(bool)
+
+    def needed(self, pid, nbrs):
+        row = np.bitwise_or.reduce(self.bits[nbrs], axis=0) & ~self.bits[pid]
+        return np.flatnonzero(np.unpackbits(row, count=self.n_pieces))
+
+    def holders(self, nbrs, piece):
+        col = self.bits[nbrs, piece >> 3] & (0x80 >> (piece & 7))
+        return nbrs[col != 0]
+
+    def coverage(self):
+        return self.counts.sum() / max(self.bits.shape[0] * self.n_pieces, 1)
+
+class PieceScheduler:
+    # "random_useful" picks uniformly among pieces the peer lacks and some
+    # live neighbor holds; "rarest" picks the one with the fewest holders.
+    def __init__(self, availability, policy, rng):
+        self.avail = availability
+        self.policy = policy
+        self.rng = rng
+
+    def pick(self, pid, nbrs):
+        if not nbrs:
+            return None, None
+        nbrs = np.array(nbrs, dtype=np.int64)
+        cand = self.avail.needed(pid, nbrs)
+        if cand.size == 0:
+            return None, None
+        if self.policy == "rarest":
+            c = self.avail.counts[cand]
+            cand = cand[c == c.min()]
+        piece = int(cand[self.rng.randrange(cand.size)])
+        senders = self.avail.holders(nbrs, piece)
+        return int(senders[self.rng.randrange(senders.size)]), piece
@@ -0,0 +1,386 @@
+import os
+import sys
+import time
+from config import SimulationConfig
+
+def report(name, rows):
+    print(f"== {name}")
+    for r in rows:
+        print("  " + "  ".join(f"{k}={v}" for k, v in r.items()))
+
+def bench_crypto(transfers=20000, piece_size=64, channels=64):
+    from crypto_channel import CryptoManager
+    data = os.urandom(piece_size)
+    rows = []
+    for mode in ("legacy", "cbc", "gcm"):
+        cfg = SimulationConfig(CRYPTO_MODE=mode, CRYPTO_FAIL_PROB=0.0)
+        cm = CryptoManager(cfg)
+        t0 = time.perf_counter()
+        for i in range(transfers):
+            a = i % channels
+            b = channels + (i * 7) % channels
+            iv, ct, tag = cm.encrypt_for(a, b, data)
+            cm.decrypt_from(a, b, iv, ct, tag)
+        dt = time.perf_counter() - t0
+        rows.append({"mode": mode, "transfers_per_s": round(transfers / dt)})
+    return rows
+
+class Node:
+    __slots__ = ("id", "neighbors")
+
+    def __init__(self, pid):
+        self.id = pid
+        self.neighbors = None
+
+def bench_churn(sizes=(10_000, 100_000, 1_000_000), rounds=5):
+    from trust import ArrayTrustSystem
+    from network import GraphNetwork
+    rows = []
+    for n in sizes:
+        cfg = SimulationConfig(NUM_PEERS=n)
+        rngs = cfg.make_rngs()
+        trust = ArrayTrustSystem(range(n), {}, cfg)
+        peers = {pid: Node(pid) for pid in range(n)}
+        t0 = time.perf_counter()
+        net = GraphNetwork(peers, trust, cfg, rngs.topology, None, rngs.numpy("topology"))
+        net.initialize_random_neighbors()
+        t_init = time.perf_counter() - t0
+        iso = rngs.numpy("attacks").random(n) < 0.01
+        t_rewire = t_churn = 0.0
+        for _ in range(rounds):
+            trust.isolated |= iso & (rngs.numpy("attacks").random(n) < 0.2)
+            t0 = time.perf_counter()
+            net.rewire_isolated()
+            t1 = time.perf_counter()
+            net.dynamic_churn()
+            t2 = time.perf_counter()
+            t_rewire += t1 - t0
+            t_churn += t2 - t1
+        live = ~trust.isolated
+        rows.append({
+            "peers": n,
+            "init_s": round(t_init, 3),
+            "rewire_ms": round(1000 * t_rewire / rounds, 1),
+            "churn_ms": round(1000 * t_churn / rounds, 1),
+            "min_live_degree": int(net.graph.deg[live].min()),
+        })
+    return rows
+
+def bench_topology(n=200_000, degree=6):
+    import numpy as np
+    import topology
+    rows = []
+    for kind in ("regular", "erdos_renyi", "barabasi_albert", "watts_strogatz"):
+        for reciprocal in (False, True):
+            cfg = SimulationConfig(TOPOLOGY=kind, TOPOLOGY_DEGREE=degree, TOPOLOGY_RECIPROCAL=reciprocal)
+            t0 = time.perf_counter()
+            g = topology.build(cfg, n, np.random.default_rng(0))
+            dt = time.perf_counter() - t0
+            rows.append({"topology": kind, "reciprocal": reciprocal, "peers": n, "edges": int(g.deg.sum()),
+                         "max_degree": int(g.deg.max()), "build_s": round(dt, 3),
+                         "mib": round(g.nbytes() / 2**20, 1)})
+    return rows
+
+def bench_content(sizes=(64, 65536, 1 << 20), corpus=64 << 20, verifies=2000):
+    import tempfile
+    from content import ContentManager
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for path in (None, os.path.join(tmp, f"corpus_{size}.bin")):
+                num = max(corpus // size, 1)
+                cfg = SimulationConfig(PIECE_SIZE=size, CONTENT_STORE_PATH=path)
+                cm = ContentManager(cfg=cfg)
+                t0 = time.perf_counter()
+                cm.make_pieces(num)
+                t_build = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                for i in range(verifies):
+                    pid = i % num
+                    cm.verify(pid, cm.get_piece(pid))
+                dt = time.perf_counter() - t0
+                rows.append({"piece_size": size, "store": "mmap" if path else "memory", "pieces": num,
+                             "build_s": round(t_build, 3), "verify_per_s": round(verifies / dt),
+                             "verify_mib_s": round(verifies * size / dt / 2**20)})
+    return rows
+
+def bench_pieces(peers=200, rounds=100):
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for policy in ("probe", "random_useful", "rarest"):
+        cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=peers, NUM_ROUNDS=rounds, PIECE_POLICY=policy)
+        sim = Simulation(cfg)
+        # The first round pays one-off costs (lazy numpy imports, initial
+        # deficit fills), so it is run untimed.
+        sim.run_round()
+        t0 = time.perf_counter()
+        for r in range(1, rounds + 1):
+            sim.round_counter = r
+            sim.run_round()
+        dt = time.perf_counter() - t0
+        sim.close()
+        rows.append({"policy": policy, "useful_per_round": round(sim.useful_transfers / rounds, 2),
+                     "coverage": round(sim.availability.coverage(), 3),
+                     "rounds_per_s": round(rounds / dt, 1)})
+    return rows
+
+def bench_alloc(sizes=(64, 65536, 1 << 20), transfers=200):
+    import tracemalloc
+    from content import ContentManager
+    from crypto_channel import CryptoManager
+    from peer import PeerTable
+    from trust import TrustSystem
+    rows = []
+    for size in sizes:
+        for mode in ("cbc", "gcm"):
+            for corrupt in (0.0, 1.0):
+                cfg = SimulationConfig(PIECE_SIZE=size, CRYPTO_MODE=mode, CRYPTO_FAIL_PROB=0.0,
+                                       CORRUPTION_PROB=corrupt, ACCIDENT_PROB=0.0)
+                content = ContentManager(cfg=cfg)
+                content.make_pieces(1)
+                piece = content.get_piece(0)
+                trust = TrustSystem([0, 1], {0: "malicious", 1: "honest"}, cfg)
+                crypto = CryptoManager(cfg)
+                peers = PeerTable([0, 1], {0: "malicious", 1: "honest"}, trust, crypto, cfg, content=content)
+                sender, receiver = peers[0], peers[1]
+                receiver.receive_piece(sender, sender.send_piece(receiver, 0, piece), 0)
+                tracemalloc.start()
+                peak = 0
+                for _ in range(transfers):
+                    receiver.cache.clear()
+                    tracemalloc.reset_peak()
+                    base = tracemalloc.get_traced_memory()[0]
+                    receiver.receive_piece(sender, sender.send_piece(receiver, 0, piece), 0)
+                    peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+                tracemalloc.stop()
+                rows.append({"piece_size": size, "mode": mode, "tampered": bool(corrupt),
+                             "peak_bytes": peak, "peak_per_piece": round(peak / size, 2)})
+    return rows
+
+def bench_peers(sizes=(10_000, 100_000), rounds=1):
+    import tracemalloc
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for n in sizes:
+        cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds, NETWORK_BACKEND="graph",
+                                                          TRUST_BACKEND="array")
+        tracemalloc.start()
+        sim = Simulation(cfg)
+        sim.run_rounds()
+        total = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        sim.close()
+        rows.append({"peers": n, "bytes_per_peer": round(total / n),
+                     "peer_table_bytes_per_peer": round(sim.peers.nbytes() / n),
+                     "graph_bytes_per_peer": round(sim.network.graph.nbytes() / n)})
+    return rows
+
+def bench_vector(n=100_000, rounds=10):
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for engine in ("serial", "vector"):
+        cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds, ROUND_ENGINE=engine,
+                                                          NETWORK_BACKEND="graph", TRUST_BACKEND="array")
+        sim = Simulation(cfg)
+        # The first round pays one-off costs (lazy numpy imports, initial
+        # deficit fills), so it is run untimed.
+        sim.run_round()
+        t0 = time.perf_counter()
+        for r in range(1, rounds + 1):
+            sim.round_counter = r
+            sim.run_round()
+        dt = time.perf_counter() - t0
+        sim.close()
+        rows.append({"engine": engine, "peers": n, "rounds_per_s": round(rounds / dt, 2),
+                     "avg_trust": round(sim.trust.mean(), 3), "isolated": sim.trust.count_isolated()})
+    rows[1]["speedup"] = round(rows[1]["rounds_per_s"] / rows[0]["rounds_per_s"])
+    return rows
+
+def bench_checkpoint(n=100_000, rounds=20, every=5):
+    # Time the run blocks per checkpoint: a forked writer versus pickling in
+    # the run's own process.
+    import tempfile
+    import checkpoint
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        for fork in (False, True):
+            cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds, ROUND_ENGINE="vector",
+                                                              CHECKPOINT_FORK=fork, LOG_DIR=d)
+            sim = Simulation(cfg)
+            blocked = 0.0
+            for r in range(rounds):
+                sim.round_counter = r
+                sim.run_round()
+                sim.rounds_done = r + 1
+                if sim.rounds_done % every == 0:
+                    t0 = time.perf_counter()
+                    sim.checkpoint()
+                    blocked += time.perf_counter() - t0
+            checkpoint.wait(sim)
+            path = sim.checkpoint_path()
+            t0 = time.perf_counter()
+            checkpoint.load(path)
+            rows.append({"fork": fork, "peers": n, "blocked_ms": round(blocked * 1e3 / (rounds // every), 1),
+                         "load_ms": round((time.perf_counter() - t0) * 1e3, 1),
+                         "size_mb": round(os.path.getsize(path) / 1e6, 2)})
+            sim.close()
+    return rows
+
+def bench_shards(n=1_000_000, rounds=5, shards=(1, 2, 4)):
+    # Round rate per shard count; speedup needs as many cores as shards. The
+    # summaries must match exactly whatever the shard count.
+    from shard import ShardedSimulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for k in shards:
+        cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds + 1, ROUND_ENGINE="sharded",
+                                                          SHARDS=k)
+        t0 = time.perf_counter()
+        sim = ShardedSimulation(cfg)
+        setup = time.perf_counter() - t0
+        sim.run_round()
+        t0 = time.perf_counter()
+        for r in range(1, rounds + 1):
+            sim.round_counter = r
+            sim.run_round()
+        dt = time.perf_counter() - t0
+        sim.close()
+        s = sim.summarize()
+        rows.append({"shards": k, "peers": n, "cpus": os.cpu_count(), "setup_s": round(setup, 2),
+                     "rounds_per_s": round(rounds / dt, 2), "avg_trust": s["avg_trust"],
+                     "isolated": s["isolated_peers"]})
+    return rows
+
+def bench_live(sizes=(1_000, 5_000), rounds=15, group=64):
+    # Per-transfer latency over localhost TCP, with one endpoint per peer and
+    # with `group` peers per endpoint, against the in-process batched engine.
+    # Scheduled piece picks keep most peers busy once the pieces have spread.
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for n in sizes:
+        for engine, per in (("batched", 1), ("live", 1), ("live", group)):
+            cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds, ROUND_ENGINE=engine,
+                                                              NETWORK_BACKEND="graph", TRUST_BACKEND="array",
+                                                              PIECE_POLICY="random_useful", LIVE_PEERS_PER_ENDPOINT=per)
+            sim = Simulation(cfg)
+            t0 = time.perf_counter()
+            sim.run_rounds()
+            dt = time.perf_counter() - t0
+            row = {"engine": engine, "peers": n, "rounds_per_s": round(rounds / dt, 2),
+                   "transfers": sim.logger.count("content"), "avg_trust": round(sim.trust.mean(), 3)}
+            if sim.live is not None:
+                row.update(sim.live.stats())
+            sim.close()
+            rows.append(row)
+    return rows
+
+def bench_index(n=3_000, rounds=20, calls=20_000):
+    # pick_neighbor and reconnect under uniform and trust-indexed selection,
+    # after a few rounds so scores have spread.
+    from simulation import Simulation
+    from sweep import SWEEP_OVERRIDES
+    rows = []
+    for sel in ("uniform", "trust"):
+        cfg = SimulationConfig(**SWEEP_OVERRIDES).replace(NUM_PEERS=n, NUM_ROUNDS=rounds, NEIGHBOR_SELECTION=sel,
+                                                          TRUST_BACKEND="array")
+        sim = Simulation(cfg)
+        sim.run_rounds()
+        net = sim.network
+        live = [pid for pid in sim.ids if not sim.trust.isolated_state(pid)]
+        pids = [live[i % len(live)] for i in range(calls)]
+        t0 = time.perf_counter()
+        for pid in pids:
+            net.pick_neighbor(pid)
+        pick = time.perf_counter() - t0
+        reps = pids[:calls // 20]
+        t0 = time.perf_counter()
+        for pid in reps:
+            p = sim.peers[pid]
+            for x in sorted(p.neighbors):
+                net.unlink(p, x)
+            net.reconnect(pid)
+        reconnect = time.perf_counter() - t0
+        sim.close()
+        rows.append({"selection": sel, "peers": n, "pick_us": round(pick * 1e6 / calls, 2),
+                     "reconnect_us": round(reconnect * 1e6 / len(reps), 1),
+                     "isolated": sim.trust.count_isolated()})
+    return rows
+
+def bench_reputation(n=1_000_000, edges=10_000_000, rounds=10, per_round=200_000):
+    # Global trust over a rating graph of the given size: the cold solve,
+    # then rounds that fold in new ratings and warm-start the iteration.
+    import numpy as np
+    from reputation import ReputationEngine
+    rng = np.random.default_rng(0)
+    rep = ReputationEngine(n, np.arange(SimulationConfig().REPUTATION_PRETRUSTED), SimulationConfig())
+    rows = []
+    t0 = time.perf_counter()
+    rep.rate_many(rng.integers(0, n, edges), rng.integers(0, n, edges), np.where(rng.random(edges) < 0.8, 1.0, -1.0))
+    iters = rep.update()
+    rows.append({"round": "cold", "edges": rep.edges(), "iterations": iters,
+                 "seconds": round(time.perf_counter() - t0, 3)})
+    for r in range(rounds):
+        rep.rate_many(rng.integers(0, n, per_round), rng.integers(0, n, per_round),
+                      np.where(rng.random(per_round) < 0.8, 1.0, -1.0))
+        t0 = time.perf_counter()
+        rep.merge(*rep.take_pending())
+        merge = time.perf_counter() - t0
+        iters = rep.iterate()
+        total = time.perf_counter() - t0
+        rows.append({"round": r, "edges": rep.edges(), "iterations": iters, "merge_s": round(merge, 3),
+                     "seconds": round(total, 3)})
+    return rows
+
+def bench_decay(n=1_000_000, rounds=50, events=20_000):
+    # Trust updates with decay off, lazy, and applied eagerly to every peer
+    # each round, then one full snapshot read.
+    import numpy as np
+    from trust import ArrayTrustSystem
+    rows = []
+    for mode in ("off", "lazy", "eager"):
+        cfg = SimulationConfig().replace(TRUST_HALF_LIFE=0 if mode == "off" else 20)
+        trust = ArrayTrustSystem(range(n), {}, cfg)
+        rng = np.random.default_rng(0)
+        t0 = time.perf_counter()
+        for r in range(rounds):
+            trust.advance(r)
+            if mode == "eager":
+                trust.decay_all()
+            trust.apply_events(rng.integers(0, n, events), rng.choice((-0.5, 0.2), events))
+        updates = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        trust.snapshot()
+        rows.append({"decay": mode, "peers": n, "round_ms": round(updates * 1e3 / rounds, 2),
+                     "snapshot_ms": round((time.perf_counter() - t0) * 1e3, 2),
+                     "isolated": trust.count_isolated()})
+    return rows
+
+BENCHES = {
+    "crypto": bench_crypto,
+    "churn": bench_churn,
+    "topology": bench_topology,
+    "content": bench_content,
+    "pieces": bench_pieces,
+    "alloc": bench_alloc,
+    "peers": bench_peers,
+    "vector": bench_vector,
+    "checkpoint": bench_checkpoint,
+    "shards": bench_shards,
+    "live": bench_live,
+    "index": bench_index,
+    "reputation": bench_reputation,
+    "decay": bench_decay,
+}
+
+def main(names):
+    for name in names or list(BENCHES):
+        report(name, BENCHES[name]())
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
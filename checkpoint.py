@@ -0,0 +1,52 @@
+import os
+import pickle
+import traceback
+
+# A checkpoint is the whole Simulation pickled between rounds (highest
+# protocol, so numpy arrays and byte buffers are written raw). One dump keeps
+# shared references intact: the RNG streams, trust system and content store
+# are the same objects after load, so a resumed run continues bit-for-bit.
+
+def save(sim, path, fork=False):
+    # Buffered log records are flushed first so the recorded file offsets
+    # cover everything emitted so far. With fork the child pickles a
+    # copy-on-write image of the process and the caller continues at once.
+    if sim.logger.sink is not None:
+        sim.logger.sink.mark()
+    wait(sim)
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    if fork and hasattr(os, "fork"):
+        pid = os.fork()
+        if pid:
+            sim.checkpoint_pid = pid
+            return
+        code = 1
+        try:
+            write(sim, path)
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    write(sim, path)
+
+def write(sim, path):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(sim, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def wait(sim):
+    pid = sim.checkpoint_pid
+    if not pid:
+        return
+    sim.checkpoint_pid = None
+    _, status = os.waitpid(pid, 0)
+    if status:
+        raise RuntimeError(f"checkpoint writer exited with status {status}")
+
+def load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
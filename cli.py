@@ -0,0 +1,150 @@
+import argparse
+import sys
+import time
+import bench
+import checkpoint
+import sweep
+from config import SimulationConfig
+from simulation import make_simulation, PHASES
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Scale presets. Past a few thousand peers the sets network and dict trust
+# backends are quadratic in setup, and the per-transfer engines need hours
+# per round at 1M, so the large presets switch to arrays and the vector
+# engine and stream (or drop) the per-event logs.
+PRESETS = {
+    "small": {},
+    "10k": {"NUM_PEERS": 10_000, "NUM_ROUNDS": 20, "NETWORK_BACKEND": "graph", "TRUST_BACKEND": "array",
+            "LOG_SINK": "stream", "TRUST_LOG_FORMAT": "npy"},
+    "100k": {"NUM_PEERS": 100_000, "NUM_ROUNDS": 100, "ROUND_ENGINE": "vector", "LOG_SINK": "stream",
+             "TRUST_LOG_FORMAT": "delta", "TRUST_LOG_DELTA": True},
+    "1m": {"NUM_PEERS": 1_000_000, "NUM_ROUNDS": 50, "ROUND_ENGINE": "vector", **sweep.SWEEP_OVERRIDES},
+}
+
+def parse_set(spec):
+    k, v = spec.split("=", 1)
+    return k, sweep.parse_value(v)
+
+def run_overrides(args):
+    params = dict(PRESETS[args.preset])
+    flags = {"NUM_PEERS": args.peers, "NUM_ROUNDS": args.rounds, "RANDOM_SEED": args.seed,
+             "PERCENT_MALICIOUS": args.malicious, "PERCENT_SNOOPER": args.snooper, "PERCENT_UNCOOP": args.uncoop,
+             "LOG_SINK": args.log_sink, "LOG_DIR": args.log_dir, "CHECKPOINT_INTERVAL": args.checkpoint_every}
+    params.update({k: v for k, v in flags.items() if v is not None})
+    if args.shards is not None:
+        params.update(ROUND_ENGINE="sharded", SHARDS=args.shards)
+    if args.no_logs:
+        params.update(sweep.SWEEP_OVERRIDES)
+    params.update(parse_set(s) for s in args.set)
+    return params
+
+def make_config(params):
+    cfg = SimulationConfig(**params)
+    mix = cfg.PERCENT_MALICIOUS + cfg.PERCENT_SNOOPER + cfg.PERCENT_UNCOOP
+    if mix > 1:
+        raise ValueError(f"adversary fractions sum to {mix:.2f} > 1")
+    cfg.PERCENT_HONEST = round(1 - mix, 6)
+    return cfg
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere.
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def perf_report(sim, rounds, transfers, crypto_ops, loop, wall):
+    # Rates are over the round loop; wall_s also covers the final log export.
+    loop = max(loop, 1e-9)
+    out = {"rounds": rounds, "wall_s": round(wall, 3), "rounds_per_s": round(rounds / loop, 2),
+           "transfers_per_s": round(transfers / loop), "crypto_ops_per_s": round(crypto_ops / loop),
+           "peak_rss_mb": peak_rss_mb()}
+    if getattr(sim, "live", None) is not None:
+        out.update(sim.live.stats())
+    total = sum(sim.timings.values()) or 1.0
+    for phase in PHASES:
+        t = sim.timings[phase]
+        out[f"{phase}_s"] = f"{t:.3f} ({100 * t / total:.1f}%)"
+    return out
+
+def counters(sim):
+    # The sharded engine samples crypto outcomes and has no channels.
+    ops = sim.crypto.encrypts + sim.crypto.decrypts if sim.crypto is not None else 0
+    return sim.logger.count("content"), ops
+
+def cmd_run(args):
+    if args.resume:
+        sim = checkpoint.load(args.resume)
+    else:
+        try:
+            sim = make_simulation(make_config(run_overrides(args)))
+        except (KeyError, ValueError) as e:
+            raise SystemExit(f"p2p-trust run: {e}")
+    start = sim.rounds_done
+    transfers, ops = counters(sim)
+    timings = dict(sim.timings)
+    t0 = time.perf_counter()
+    sim.run_rounds()
+    t1 = time.perf_counter()
+    transfers2, ops2 = counters(sim)
+    sim.finalize()
+    wall = time.perf_counter() - t0
+    sim.timings = {k: v - timings[k] for k, v in sim.timings.items()}
+    if not args.no_report:
+        rounds = sim.rounds_done - start
+        bench.report("perf", [perf_report(sim, rounds, transfers2 - transfers, ops2 - ops, t1 - t0, wall)])
+
+def cmd_sweep(args):
+    # Preset values join the grid as single-valued parameters.
+    preset = [f"{k}={v}" for k, v in PRESETS[args.preset].items()]
+    args.param = preset + args.param
+    sweep.main(args)
+
+def cmd_bench(args):
+    unknown = [n for n in args.names if n not in bench.BENCHES]
+    if unknown:
+        raise SystemExit(f"unknown bench {', '.join(unknown)}; choose from {', '.join(bench.BENCHES)}")
+    bench.main(args.names)
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="p2p-trust", description="P2P trust-scoring simulator")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run one simulation and report throughput")
+    run.add_argument("--preset", choices=list(PRESETS), default="small")
+    run.add_argument("--peers", type=int, default=None, help="NUM_PEERS")
+    run.add_argument("--rounds", type=int, default=None, help="NUM_ROUNDS")
+    run.add_argument("--seed", type=int, default=None, help="RANDOM_SEED")
+    run.add_argument("--malicious", type=float, default=None, help="fraction of malicious peers")
+    run.add_argument("--snooper", type=float, default=None, help="fraction of snooping peers")
+    run.add_argument("--uncoop", type=float, default=None, help="fraction of uncooperative peers")
+    run.add_argument("--log-sink", choices=("memory", "stream"), default=None)
+    run.add_argument("--log-dir", default=None)
+    run.add_argument("--no-logs", action="store_true", help="disable per-event and trust logs")
+    run.add_argument("--checkpoint-every", type=int, default=None, help="CHECKPOINT_INTERVAL")
+    run.add_argument("--shards", type=int, default=None, help="run the sharded engine on this many processes")
+    run.add_argument("--resume", default=None, help="continue from this checkpoint file")
+    run.add_argument("--set", action="append", default=[], help="KEY=VALUE config override (repeatable)")
+    run.add_argument("--no-report", action="store_true", help="skip the performance report")
+    run.set_defaults(func=cmd_run)
+
+    sw = sub.add_parser("sweep", help="run a parameter grid over seeds")
+    sw.add_argument("--preset", choices=list(PRESETS), default="small")
+    sweep.add_arguments(sw)
+    sw.set_defaults(func=cmd_sweep)
+
+    b = sub.add_parser("bench", help="run micro-benchmarks")
+    b.add_argument("names", nargs="*", help=f"any of: {', '.join(bench.BENCHES)} (default: all)")
+    b.set_defaults(func=cmd_bench)
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,33 @@
+import copy
 import random
+import numpy as np
 
 NUM_PEERS = 60
 NUM_ROUNDS = 250
 
 MIN_NEIGHBORS = 3
 MAX_NEIGHBORS = 12
+CHURN_PROB = 0.05
+
+# "random" keeps the original per-peer random neighbor draw; "regular",
+# "erdos_renyi", "barabasi_albert", "watts_strogatz" and "edgelist" build the
+# adjacency directly (see topology.py).
+TOPOLOGY = "random"
+TOPOLOGY_DEGREE = 6
+TOPOLOGY_P = None
+TOPOLOGY_REWIRE_PROB = 0.1
+TOPOLOGY_EDGE_FILE = None
+TOPOLOGY_RECIPROCAL = False
 
 CONTENT_PIECES = 40
+PIECE_SIZE = 64
+CONTENT_DIGEST_SIZE = 32
+# None keeps the piece buffer in memory; a path memory-maps the corpus from
+# that file (generated on first use).
+CONTENT_STORE_PATH = None
+# "probe" asks a random neighbor for a random piece; "random_useful" and
+# "rarest" pick from pieces a live neighbor holds and the peer lacks.
+PIECE_POLICY = "probe"
 
 TRUST_INITIAL = 5.0
 TRUST_MAX = 7.0
@@ -25,6 +46,30 @@ TRUST_THRESHOLD = 5.0
 ISOLATION_THRESHOLD = 3.0
 REWIRING_THRESHOLD = 4.0
 
+# "uniform" picks and reconnects uniformly among live peers; "trust" (sets
+# network backend) picks neighbors weighted by trust above
+# ISOLATION_THRESHOLD, cuts links to peers below REWIRING_THRESHOLD, and
+# reconnects to TRUST_TOPK candidates at or above TRUST_THRESHOLD drawn from
+# the top of a TRUST_INDEX_BUCKETS-bucket score histogram.
+NEIGHBOR_SELECTION = "uniform"
+TRUST_TOPK = 16
+TRUST_INDEX_BUCKETS = 28
+
+# Exponential decay of live scores toward TRUST_INITIAL with this half-life
+# in rounds (0 disables). It is applied lazily, from each peer's last update,
+# when a score is read or updated; isolated peers keep their score.
+TRUST_HALF_LIFE = 0
+
+# EigenTrust-style global reputation from the receivers' ratings of each
+# transfer, refreshed after every round by power iteration warm-started from
+# the previous vector. REPUTATION_ALPHA weights the teleport to the first
+# REPUTATION_PRETRUSTED honest peers.
+REPUTATION = False
+REPUTATION_ALPHA = 0.1
+REPUTATION_PRETRUSTED = 5
+REPUTATION_TOL = 1e-6
+REPUTATION_MAX_ITERS = 50
+
 PERCENT_MALICIOUS = 0.12
 PERCENT_SNOOPER = 0.10
 PERCENT_UNCOOP = 0.10
@@ -37,6 +82,43 @@ ACCIDENT_PROB = 0.02
 
 CRYPTO_KEY_ROTATION_INTERVAL = 15
 CRYPTO_FAIL_PROB = 0.08
+# "cbc": AES-CBC + HMAC-SHA256 with per-epoch cached MAC state,
+# "legacy": same wire format with per-call HMAC.new, "gcm": AES-GCM AEAD.
+CRYPTO_MODE = "cbc"
+# 0 disables the LRU bound / idle eviction of the channel table.
+CRYPTO_CHANNEL_CAPACITY = 0
+CRYPTO_CHANNEL_IDLE_ROUNDS = 0
+
+TRUST_BACKEND = "dict"
+# Score dtype of the array backend. "float32" halves its memory, but rounding
+# every per-event update can move a score across a threshold, so runs no
+# longer match the dict backend.
+TRUST_DTYPE = "float64"
+
+# "serial" runs one transfer at a time; "batched" collects a round of
+# transfers and runs encrypt/decrypt in batches (on CRYPTO_WORKERS threads);
+# "vector" samples transfer outcomes as arrays without real crypto or
+# per-event log records (implies the graph network and array trust backends);
+# "sharded" runs the vector round model over SHARDS worker processes, each
+# owning a contiguous range of peer ids (SHARDS = 1 runs in-process); "live"
+# runs the batched pipeline with every transfer sent as a binary frame over
+# localhost TCP between peer endpoints (LIVE_PEERS_PER_ENDPOINT peers share a
+# listening socket) and settled from the receiver's decrypt outcome.
+ROUND_ENGINE = "serial"
+SHARDS = 1
+# Pooled connections per endpoint pair (0: unbounded; each costs two file
+# descriptors) and the bytes a connection buffers before senders wait.
+LIVE_PEERS_PER_ENDPOINT = 1
+LIVE_MAX_CONNECTIONS = 4096
+LIVE_SEND_BUFFER = 1 << 16
+# Seconds exchange() waits for a round's frames after the last send before
+# failing the ones still missing.
+LIVE_TIMEOUT = 30.0
+# "sets" keeps a neighbor set per Peer; "graph" uses the array-backed Graph.
+NETWORK_BACKEND = "sets"
+# Rewire only around peers that just became isolated (sets backend).
+INCREMENTAL_REWIRING = False
+CRYPTO_WORKERS = 0
 
 LOG_TRUST = True
 LOG_EVENTS = True
@@ -44,5 +126,65 @@ LOG_NEIGHBORS = True
 LOG_CONTENT = True
 LOG_CRYPTO = True
 
+# Fraction of records kept per log category; records whose outcome is
+# False (failed transfers) are always kept.
+LOG_SAMPLE_RATES = {}
+
+LOG_DIR = "logs"
+LOG_SINK = "memory"
+LOG_BUFFER_RECORDS = 4096
+LOG_WRITER_THREAD = False
+
+TRUST_LOG_FORMAT = "csv"
+TRUST_LOG_DELTA = False
+
+# Pickle the whole simulation every CHECKPOINT_INTERVAL rounds (0 disables)
+# to CHECKPOINT_PATH (None: LOG_DIR/checkpoint.pkl). CHECKPOINT_FORK writes
+# from a forked child so the run continues while the snapshot is saved.
+CHECKPOINT_INTERVAL = 0
+CHECKPOINT_PATH = None
+CHECKPOINT_FORK = True
+
 RANDOM_SEED = 42
-random.seed(RANDOM_SEED)
+
+RNG_STREAMS = ("topology", "transfers", "attacks", "crypto", "logging")
+
+def defaults():
+    return {k: copy.copy(v) for k, v in globals().items() if k.isupper()}
+
+class SimulationConfig:
+    def __init__(self, **overrides):
+        self.__dict__.update(defaults())
+        for k, v in overrides.items():
+            if k not in self.__dict__:
+                raise KeyError(f"unknown config parameter {k}")
+            setattr(self, k, v)
+
+    def replace(self, **overrides):
+        out = SimulationConfig()
+        out.__dict__.update(copy.deepcopy(self.__dict__))
+        for k, v in overrides.items():
+            if k not in out.__dict__:
+                raise KeyError(f"unknown config parameter {k}")
+            setattr(out, k, v)
+        return out
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def make_rngs(self):
+        return RngStreams(self.RANDOM_SEED)
+
+class RngStreams:
+    def __init__(self, seed, names=RNG_STREAMS):
+        self.seed = seed
+        self.names = names
+        self.np_streams = {}
+        for name in names:
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+
+    def numpy(self, name):
+        if name not in self.np_streams:
+            ss = np.random.SeedSequence(self.seed, spawn_key=(self.names.index(name),))
+            self.np_streams[name] = np.random.default_rng(ss)
+        return self.np_streams[name]
@@ -1,34 +1,104 @@
+import hashlib
+import mmap
 import os
 import random
+from config import SimulationConfig
 
 class ContentManager:
-    def __init__(self):
-        self.all_pieces = {}
-        self.checksums = {}
+    # All pieces live in one contiguous buffer (a bytearray, or a private
+    # mmap of CONTENT_STORE_PATH); get_piece hands out read-only memoryview
+    # slices and verify compares against precomputed BLAKE2b digests.
+    def __init__(self, rng=None, cfg=None):
+        self.cfg = cfg or SimulationConfig()
+        self.rng = rng or random.Random()
+        self.piece_size = self.cfg.PIECE_SIZE
+        self.digest_size = self.cfg.CONTENT_DIGEST_SIZE
+        self.path = self.cfg.CONTENT_STORE_PATH
+        self.num = 0
+        self.buffer = bytearray()
+        self.view = memoryview(self.buffer)
+        self.digests = []
+        self.ids = range(0)
+        self.poisoned = set()
 
     def make_pieces(self, num):
-        for i in range(num):
-            data = os.urandom(64)
-            self.all_pieces[i] = data
-            self.checksums[i] = sum(data) % 256
+        size = num * self.piece_size
+        if self.path is None:
+            self.buffer = bytearray(size)
+            fill_random(memoryview(self.buffer))
+        else:
+            self.buffer = map_store(self.path, size)
+        self.view = memoryview(self.buffer)
+        self.num = num
+        self.ids = range(num)
+        self.digests = [self.digest(self.piece_view(i)) for i in self.ids]
+        self.poisoned = set()
+
+    def __getstate__(self):
+        # A mapped store is copy-on-write over the corpus file, so only the
+        # pieces poisoned since it was mapped need to be saved.
+        state = dict(self.__dict__)
+        del state["view"]
+        if self.path is not None:
+            state["buffer"] = {pid: bytes(self.piece_view(pid)) for pid in self.poisoned}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path is not None:
+            patches = self.buffer
+            self.buffer = map_store(self.path, self.num * self.piece_size)
+            self.view = memoryview(self.buffer)
+            for pid, data in patches.items():
+                self.piece_view(pid)[:] = data
+        else:
+            self.view = memoryview(self.buffer)
+
+    def digest(self, data):
+        return hashlib.blake2b(data, digest_size=self.digest_size).digest()
+
+    def piece_view(self, pid):
+        start = pid * self.piece_size
+        return self.view[start:start + self.piece_size]
 
     def poison_piece(self, pid):
-        if pid not in self.all_pieces:
+        if pid not in self.ids:
             return
-        data = bytearray(self.all_pieces[pid])
-        if len(data) > 0:
-            idx = random.randint(0, len(data)-1)
-            data[idx] ^= 0xAA
-        self.all_pieces[pid] = bytes(data)
-        self.checksums[pid] = sum(data) % 256
+        view = self.piece_view(pid)
+        if len(view) > 0:
+            idx = self.rng.randint(0, len(view)-1)
+            view[idx] ^= 0xAA
+        self.digests[pid] = self.digest(view)
+        self.poisoned.add(pid)
 
     def verify(self, pid, data):
-        if pid not in self.checksums:
+        if pid not in self.ids:
             return False
-        return (sum(data) % 256) == self.checksums[pid]
+        return self.digest(data) == self.digests[pid]
 
     def get_piece(self, pid):
-        return self.all_pieces[pid]
+        if pid not in self.ids:
+            raise KeyError(pid)
+        return self.piece_view(pid).toreadonly()
 
     def get_all_ids(self):
-        return list(self.all_pieces.keys())
+        return self.ids
+
+def fill_random(view, chunk=1 << 24):
+    for pos in range(0, len(view), chunk):
+        end = min(pos + chunk, len(view))
+        view[pos:end] = os.urandom(end - pos)
+
+def map_store(path, size):
+    # An existing corpus of at least `size` bytes is reused; otherwise the file
+    # is (re)generated. The mapping is copy-on-write so poisoning never
+    # reaches the file on disk.
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        with open(path, "wb") as f:
+            chunk = 1 << 24
+            for pos in range(0, size, chunk):
+                f.write(os.urandom(min(chunk, size - pos)))
+    if size == 0:
+        return bytearray()
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY)
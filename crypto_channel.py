@@ -1,82 +1,284 @@
+import hashlib
+import hmac
+from collections import OrderedDict
 from Crypto.Cipher import AES
 from Crypto.Hash import HMAC, SHA256
 from Crypto.Random import get_random_bytes
-import config
-import random
+from config import SimulationConfig
+
+class KeyPool:
+    def __init__(self, block=4096):
+        self.block = block
+        self.buf = b""
+        self.pos = 0
+
+    def take(self, n):
+        if self.pos + n > len(self.buf):
+            self.buf = get_random_bytes(max(self.block, n))
+            self.pos = 0
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return out
 
 class CryptoChannel:
-    def __init__(self, peer_a, peer_b):
+    __slots__ = ("cfg", "rng", "pool", "mode", "peer_a", "peer_b", "epoch", "key", "hmac_key",
+                 "mac", "epoch_keys", "rounds_since_rotation", "last_used")
+
+    def __init__(self, peer_a, peer_b, cfg=None, rng=None, pool=None):
+        self.cfg = cfg or SimulationConfig()
+        self.rng = rng or self.cfg.make_rngs().crypto
+        self.pool = pool
+        self.mode = self.cfg.CRYPTO_MODE
         self.peer_a = peer_a
         self.peer_b = peer_b
-        self.key = get_random_bytes(32)
-        self.hmac_key = get_random_bytes(32)
+        self.epoch = -1
+        self.key = None
+        self.hmac_key = None
+        self.mac = None
+        self.epoch_keys = None
         self.rounds_since_rotation = 0
+        self.last_used = 0
+
+    # The cached MAC state cannot be pickled; it is rebuilt from the epoch keys.
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k not in ("mac", "epoch_keys")}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+        self.mac = None
+        self.epoch_keys = None
+        if self.key is not None:
+            self.mac = hmac.new(self.hmac_key, digestmod=hashlib.sha256)
+            self.epoch_keys = (self.mode, self.key, self.hmac_key, self.mac)
+
+    def random_bytes(self, n):
+        if self.pool is None or self.mode == "legacy":
+            return get_random_bytes(n)
+        return self.pool.take(n)
+
+    def keys(self):
+        if self.epoch_keys is None:
+            self.generate_keys()
+        return self.epoch_keys
 
     def pad(self, data):
-        pad_len = 16 - (len(data) % 16)
-        return data + bytes([pad_len]) * pad_len
+        return pad(data)
 
     def unpad(self, data):
-        pad_len = data[-1]
-        if pad_len < 1 or pad_len > 16:
-            raise ValueError("Bad padding")
-        return data[:-pad_len]
+        return unpad(data)
 
     def maybe_fail(self):
-        return random.random() < config.CRYPTO_FAIL_PROB
+        return self.rng.random() < self.cfg.CRYPTO_FAIL_PROB
 
     def rotate_keys(self):
-        self.key = get_random_bytes(32)
-        self.hmac_key = get_random_bytes(32)
+        self.generate_keys()
         self.rounds_since_rotation = 0
 
+    def generate_keys(self):
+        material = self.random_bytes(64)
+        self.key = material[:32]
+        self.hmac_key = material[32:]
+        self.mac = hmac.new(self.hmac_key, digestmod=hashlib.sha256)
+        self.epoch_keys = (self.mode, self.key, self.hmac_key, self.mac)
+        self.epoch += 1
+
     def encrypt(self, plaintext, sender_id, receiver_id):
         if self.maybe_fail():
             return None, None, None
-        iv = get_random_bytes(16)
-        cipher = AES.new(self.key, AES.MODE_CBC, iv=iv)
-        padded = self.pad(plaintext)
-        ciphertext = cipher.encrypt(padded)
-        h = HMAC.new(self.hmac_key, ciphertext, digestmod=SHA256)
-        tag = h.digest()
-        return iv, ciphertext, tag
+        return seal(self.keys(), self.new_iv(), plaintext)
 
     def decrypt(self, iv, ciphertext, tag, receiver_id):
-        if iv is None or ciphertext is None or tag is None:
-            raise ValueError("crypto-failure")
-        h = HMAC.new(self.hmac_key, ciphertext, digestmod=SHA256)
+        return open_sealed(self.keys(), iv, ciphertext, tag)
+
+    def new_iv(self):
+        return self.random_bytes(12 if self.mode == "gcm" else 16)
+
+def pad(data):
+    pad_len = 16 - (len(data) % 16)
+    return data + bytes([pad_len]) * pad_len
+
+def unpad(data):
+    pad_len = data[-1]
+    if pad_len < 1 or pad_len > 16:
+        raise ValueError("Bad padding")
+    return memoryview(data).toreadonly()[:-pad_len]
+
+def cbc_tag(keys, ciphertext):
+    mode, key, hmac_key, mac = keys
+    if mode == "legacy":
+        return HMAC.new(hmac_key, ciphertext, digestmod=SHA256).digest()
+    h = mac.copy()
+    h.update(ciphertext)
+    return h.digest()
+
+# Ciphertext and plaintext are written into fresh bytearrays via output=,
+# so a transfer allocates one buffer per direction and tampering can flip
+# bytes in place.
+def seal(keys, iv, plaintext):
+    mode, key = keys[0], keys[1]
+    if mode == "gcm":
+        cipher = AES.new(key, AES.MODE_GCM, nonce=iv)
+        ciphertext = bytearray(len(plaintext))
+        # GHASH slices its input; a memoryview keeps that slice copy-free.
+        cipher.encrypt(plaintext, output=memoryview(ciphertext))
+        return iv, ciphertext, cipher.digest()
+    cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+    ciphertext = cbc_encrypt(cipher, plaintext)
+    return iv, ciphertext, cbc_tag(keys, ciphertext)
+
+def cbc_encrypt(cipher, plaintext):
+    view = memoryview(plaintext)
+    body = len(view) - len(view) % 16
+    out = bytearray(body + 16)
+    dest = memoryview(out)
+    if body:
+        cipher.encrypt(view[:body], output=dest[:body])
+    cipher.encrypt(pad(view[body:].tobytes()), output=dest[body:])
+    return out
+
+def open_sealed(keys, iv, ciphertext, tag):
+    if iv is None or ciphertext is None or tag is None:
+        raise ValueError("crypto-failure")
+    mode, key = keys[0], keys[1]
+    if mode == "gcm":
+        cipher = AES.new(key, AES.MODE_GCM, nonce=iv)
+        plaintext = bytearray(len(ciphertext))
+        cipher.decrypt(memoryview(ciphertext), output=plaintext)
         try:
-            h.verify(tag)
-        except:
+            cipher.verify(tag)
+        except ValueError:
             raise ValueError("bad-hmac")
-        cipher = AES.new(self.key, AES.MODE_CBC, iv=iv)
-        try:
-            padded = cipher.decrypt(ciphertext)
-        except:
-            raise ValueError("decrypt-error")
-        try:
-            plaintext = self.unpad(padded)
-        except:
-            raise ValueError("bad-padding")
-        return plaintext
+        return memoryview(plaintext).toreadonly()
+    if not hmac.compare_digest(cbc_tag(keys, ciphertext), tag):
+        raise ValueError("bad-hmac")
+    cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+    padded = bytearray(len(ciphertext))
+    try:
+        cipher.decrypt(ciphertext, output=padded)
+    except:
+        raise ValueError("decrypt-error")
+    try:
+        plaintext = unpad(padded)
+    except:
+        raise ValueError("bad-padding")
+    return plaintext
+
+def seal_job(job):
+    keys, iv, plaintext = job
+    return seal(keys, iv, plaintext)
+
+def open_job(job):
+    keys, iv, ciphertext, tag = job
+    try:
+        return open_sealed(keys, iv, ciphertext, tag), None
+    except ValueError as e:
+        return None, str(e)
+
+def run_grouped(fn, jobs, groups, executor=None):
+    out = [None] * len(jobs)
+    def run_group(idx):
+        return [(i, fn(jobs[i])) for i in idx]
+    parts = map(run_group, groups) if executor is None else executor.map(run_group, groups)
+    for part in parts:
+        for i, res in part:
+            out[i] = res
+    return out
 
 class CryptoManager:
-    def __init__(self):
-        self.channels = {}
+    def __init__(self, cfg=None, rng=None):
+        self.cfg = cfg or SimulationConfig()
+        self.rng = rng or self.cfg.make_rngs().crypto
+        self.pool = KeyPool()
+        self.channels = OrderedDict()
+        self.capacity = self.cfg.CRYPTO_CHANNEL_CAPACITY
+        self.idle_rounds = self.cfg.CRYPTO_CHANNEL_IDLE_ROUNDS
+        self.now = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.encrypts = 0
+        self.decrypts = 0
+
+    def channel_key(self, a, b):
+        return (a << 32) | b if a < b else (b << 32) | a
 
     def get_channel(self, a, b):
-        key = tuple(sorted((a, b)))
-        if key not in self.channels:
-            self.channels[key] = CryptoChannel(a, b)
-        return self.channels[key]
+        key = (a << 32) | b if a < b else (b << 32) | a
+        ch = self.channels.get(key)
+        if ch is None:
+            self.misses += 1
+            ch = CryptoChannel(a, b, self.cfg, self.rng, self.pool)
+            self.channels[key] = ch
+            if self.capacity and len(self.channels) > self.capacity:
+                self.channels.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.channels.move_to_end(key)
+        ch.last_used = self.now
+        return ch
+
+    def release(self, a, b):
+        if self.channels.pop(self.channel_key(a, b), None) is not None:
+            self.evictions += 1
+
+    def tick(self, round_idx):
+        self.now = round_idx
+        if not self.idle_rounds:
+            return
+        cutoff = round_idx - self.idle_rounds
+        while self.channels:
+            key, ch = next(iter(self.channels.items()))
+            if ch.last_used >= cutoff:
+                break
+            del self.channels[key]
+            self.evictions += 1
+
+    def stats(self):
+        return {"channels": len(self.channels), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "encrypts": self.encrypts, "decrypts": self.decrypts}
 
     def encrypt_for(self, sender, receiver, plaintext):
         ch = self.get_channel(sender, receiver)
         ch.rounds_since_rotation += 1
-        if ch.rounds_since_rotation >= config.CRYPTO_KEY_ROTATION_INTERVAL:
+        if ch.rounds_since_rotation >= self.cfg.CRYPTO_KEY_ROTATION_INTERVAL:
             ch.rotate_keys()
+        self.encrypts += 1
         return ch.encrypt(plaintext, sender, receiver)
 
     def decrypt_from(self, sender, receiver, iv, ciphertext, tag):
         ch = self.get_channel(sender, receiver)
+        self.decrypts += 1
         return ch.decrypt(iv, ciphertext, tag, receiver)
+
+    def encrypt_batch(self, reqs, executor=None):
+        # Key rotation and failure draws happen here in request order; only the
+        # cipher work is dispatched, grouped by channel.
+        jobs = []
+        failed = []
+        groups = {}
+        for i, (sender, receiver, plaintext) in enumerate(reqs):
+            ch = self.get_channel(sender, receiver)
+            ch.rounds_since_rotation += 1
+            if ch.rounds_since_rotation >= self.cfg.CRYPTO_KEY_ROTATION_INTERVAL:
+                ch.rotate_keys()
+            if ch.maybe_fail():
+                jobs.append(None)
+                failed.append(i)
+                continue
+            jobs.append((ch.keys(), ch.new_iv(), plaintext))
+            groups.setdefault(self.channel_key(sender, receiver), []).append(i)
+        self.encrypts += len(reqs)
+        sealed = run_grouped(seal_job, jobs, list(groups.values()), executor)
+        keys = [None if j is None else j[0] for j in jobs]
+        for i in failed:
+            sealed[i] = (None, None, None)
+        return sealed, keys
+
+    def decrypt_batch(self, jobs, executor=None):
+        self.decrypts += len(jobs)
+        groups = {}
+        for i, job in enumerate(jobs):
+            groups.setdefault(id(job[0]), []).append(i)
+        return run_grouped(open_job, jobs, list(groups.values()), executor)
@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+
+HEADER = "round\tkind\tsrc\tdst\tpiece\toutcome\n"
+
+class StreamingSink:
+    def __init__(self, out_dir, categories, buffer_records=4096, threaded=False, queue_size=64):
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        self.out_dir = out_dir
+        self.buffer_records = buffer_records
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self.files = {}
+        self.buffers = {}
+        self.offsets = {}
+        for c in categories:
+            f = open(self.path(c), "w")
+            f.write(HEADER)
+            self.files[c] = f
+            self.buffers[c] = []
+        self.start()
+
+    def path(self, category):
+        return os.path.join(self.out_dir, f"{category}_log.tsv")
+
+    def start(self):
+        self.queue = None
+        self.thread = None
+        self.error = None
+        if self.threaded:
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self.thread = threading.Thread(target=self.drain, daemon=True)
+            self.thread.start()
+
+    def mark(self):
+        # Writes out everything buffered and records each file's length; a
+        # sink restored from a checkpoint truncates back to these offsets.
+        self.flush()
+        if self.queue is not None:
+            self.queue.join()
+            self.check()
+            for f in self.files.values():
+                f.flush()
+        self.offsets = {c: f.tell() for c, f in self.files.items()}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["files"] = None
+        state["queue"] = None
+        state["thread"] = None
+        state["error"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.files = {}
+        for c, offset in self.offsets.items():
+            f = open(self.path(c), "r+")
+            f.seek(offset)
+            f.truncate()
+            self.files[c] = f
+        self.start()
+
+    def write(self, category, record):
+        if self.error is not None:
+            raise self.error
+        buf = self.buffers[category]
+        buf.append(record)
+        if len(buf) >= self.buffer_records:
+            self.flush_category(category)
+
+    def flush_category(self, category):
+        buf = self.buffers[category]
+        if not buf:
+            return
+        text = "".join("\t".join(map(str, r)) + "\n" for r in buf)
+        buf.clear()
+        if self.queue is not None:
+            self.queue.put((category, text))
+        else:
+            self.files[category].write(text)
+
+    def drain(self):
+        # A failed write is kept for the producer to raise; later items are
+        # dropped rather than left in the queue, so put() and join() never
+        # block on a dead writer.
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                if self.error is None:
+                    category, text = item
+                    self.files[category].write(text)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def flush(self):
+        for c in self.buffers:
+            self.flush_category(c)
+        if self.queue is None:
+            for f in self.files.values():
+                f.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+                self.thread = None
+                self.queue = None
+            for f in self.files.values():
+                f.close()
+            self.files = {}
+        self.check()
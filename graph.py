@@ -0,0 +1,236 @@
+import numpy as np
+
+class Graph:
+    # Dynamic CSR: row u lives in adj[start[u]:start[u] + deg[u]] with room for
+    # cap[u] entries; a row that outgrows its slot is moved to the buffer end.
+    def __init__(self, n, width=8):
+        width = max(width, 1)
+        self.n = n
+        self.start = np.arange(n, dtype=np.int64) * width
+        self.cap = np.full(n, width, dtype=np.int64)
+        self.deg = np.zeros(n, dtype=np.int64)
+        self.adj = np.full(n * width, -1, dtype=np.int32)
+        self.end = n * width
+
+    @classmethod
+    def from_edges(cls, n, src, dst, slack=2):
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        keep = src != dst
+        src, dst = src[keep], dst[keep]
+        if src.size:
+            key = np.sort(src * n + dst)
+            key = key[np.concatenate(([True], key[1:] != key[:-1]))]
+            src, dst = key // n, key % n
+        g = cls(0)
+        g.n = n
+        g.deg = np.bincount(src, minlength=n).astype(np.int64)
+        g.cap = g.deg + slack
+        g.start = np.zeros(n, dtype=np.int64)
+        np.cumsum(g.cap[:-1], out=g.start[1:])
+        g.end = int(g.cap.sum())
+        g.adj = np.full(g.end, -1, dtype=np.int32)
+        first = np.zeros(n, dtype=np.int64)
+        np.cumsum(g.deg[:-1], out=first[1:])
+        g.adj[g.start[src] + np.arange(src.size) - first[src]] = dst
+        return g
+
+    @classmethod
+    def from_sets(cls, n, neighbor_sets):
+        src = []
+        dst = []
+        for u, s in neighbor_sets.items():
+            src.extend([u] * len(s))
+            dst.extend(s)
+        return cls.from_edges(n, src, dst)
+
+    def row_slots(self, rows):
+        counts = self.deg[rows]
+        r = np.repeat(rows, counts)
+        base = np.cumsum(counts) - counts
+        off = np.arange(r.size, dtype=np.int64) - np.repeat(base, counts)
+        return r, self.start[r] + off
+
+    def neighbors(self, u):
+        s = self.start[u]
+        return self.adj[s:s + self.deg[u]]
+
+    def degree(self, u):
+        return int(self.deg[u])
+
+    def contains(self, u, v):
+        d = self.deg[u]
+        return d > 0 and v in self.neighbors(u).tolist()
+
+    def has_edges(self, src, dst):
+        # Scans each query's row directly; rows are short, so this beats
+        # sorting the union of the rows.
+        counts = self.deg[src]
+        q = np.repeat(np.arange(src.size), counts)
+        base = np.cumsum(counts) - counts
+        pos = np.repeat(self.start[src] - base, counts) + np.arange(q.size, dtype=np.int64)
+        out = np.zeros(src.size, dtype=bool)
+        out[q[self.adj[pos] == dst[q]]] = True
+        return out
+
+    def reserve(self, rows, needed):
+        move = needed > self.cap[rows]
+        if not move.any():
+            return
+        rows, needed = rows[move], needed[move]
+        newcap = np.maximum(2 * self.cap[rows], needed)
+        total = int(newcap.sum())
+        if self.end + total > self.adj.size:
+            size = max(2 * self.adj.size, self.end + total)
+            self.adj = np.concatenate([self.adj, np.full(size - self.adj.size, -1, dtype=np.int32)])
+        newstart = self.end + np.cumsum(newcap) - newcap
+        r, pos = self.row_slots(rows)
+        moved = self.start.copy()
+        moved[rows] = newstart
+        self.adj[moved[r] + pos - self.start[r]] = self.adj[pos]
+        self.adj[pos] = -1
+        self.start[rows] = newstart
+        self.cap[rows] = newcap
+        self.end += total
+        if self.end > 2 * int(self.cap.sum()) + 1024:
+            self.compact()
+
+    def compact(self, slack=2):
+        r, pos = self.row_slots(np.arange(self.n))
+        vals = self.adj[pos]
+        cap = np.maximum(self.cap, self.deg + slack)
+        cap = np.minimum(cap, self.deg + max(slack, 8))
+        start = np.zeros(self.n, dtype=np.int64)
+        np.cumsum(cap[:-1], out=start[1:])
+        self.end = int(cap.sum())
+        self.adj = np.full(self.end, -1, dtype=np.int32)
+        self.adj[start[r] + pos - self.start[r]] = vals
+        self.start = start
+        self.cap = cap
+
+    def add(self, u, v):
+        if u == v or self.contains(u, v):
+            return False
+        d = self.deg[u]
+        if d == self.cap[u]:
+            self.reserve(np.array([u]), np.array([d + 1]))
+        self.adj[self.start[u] + d] = v
+        self.deg[u] = d + 1
+        return True
+
+    def add_edges(self, src, dst):
+        # Appends (src, dst) pairs that are known to be absent and unique.
+        if src.size == 0:
+            return
+        order = np.argsort(src, kind="stable")
+        src, dst = src[order], dst[order]
+        first = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+        rows = src[first]
+        counts = np.diff(np.r_[first, src.size])
+        rank = np.arange(src.size) - np.repeat(first, counts)
+        self.reserve(rows, self.deg[rows] + counts)
+        self.adj[self.start[src] + self.deg[src] + rank] = dst
+        self.deg[rows] += counts
+
+    def remove_at(self, u, i):
+        s = self.start[u]
+        d = self.deg[u] - 1
+        v = int(self.adj[s + i])
+        self.adj[s + i] = self.adj[s + d]
+        self.adj[s + d] = -1
+        self.deg[u] = d
+        return v
+
+    def remove_slots(self, rows, cols):
+        # Swap-removes one slot per row; rows must be unique.
+        s = self.start[rows]
+        last = s + self.deg[rows] - 1
+        removed = self.adj[s + cols].copy()
+        self.adj[s + cols] = self.adj[last]
+        self.adj[last] = -1
+        self.deg[rows] -= 1
+        return removed
+
+    def remove(self, u, v):
+        row = self.neighbors(u).tolist()
+        if v not in row:
+            return False
+        self.remove_at(u, row.index(v))
+        return True
+
+    def clear(self, u):
+        self.neighbors(u)[:] = -1
+        self.deg[u] = 0
+
+    def remove_masked(self, mask, row_mask=None):
+        # Drops every edge touching a masked peer and compacts the affected rows
+        # in place; returns the removed (u, v) pairs. Free slots hold -1, so one
+        # scan of adj finds the edges pointing at masked peers. row_mask marks
+        # the rows to clear when row ids are not the same space as neighbor
+        # ids (a shard's rows hold global ids).
+        if row_mask is None:
+            row_mask = mask
+        hit = np.flatnonzero((self.adj >= 0) & mask[np.maximum(self.adj, 0)])
+        order = np.argsort(self.start, kind="stable")
+        owner = order[np.searchsorted(self.start[order], hit, side="right") - 1]
+        rows = np.union1d(owner, np.flatnonzero(row_mask & (self.deg > 0)))
+        if rows.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        r, pos = self.row_slots(rows)
+        v = self.adj[pos]
+        bad = mask[v] | row_mask[r]
+        keep = ~bad
+        ri = np.repeat(np.arange(rows.size), self.deg[rows])
+        per_row = np.bincount(ri[keep], minlength=rows.size)
+        rank = np.cumsum(keep) - 1 - (np.cumsum(per_row) - per_row)[ri]
+        self.adj[pos] = -1
+        self.adj[self.start[r[keep]] + rank[keep]] = v[keep]
+        self.deg[rows] = per_row
+        return r[bad], v[bad].astype(np.int64)
+
+    def to_csr(self):
+        indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(self.deg, out=indptr[1:])
+        r, pos = self.row_slots(np.arange(self.n))
+        return indptr, self.adj[pos].copy()
+
+    def nbytes(self):
+        return self.adj.nbytes + self.start.nbytes + self.cap.nbytes + self.deg.nbytes
+
+    def view(self, u):
+        return NeighborView(self, u)
+
+class NeighborView:
+    __slots__ = ("graph", "u")
+
+    def __init__(self, graph, u):
+        self.graph = graph
+        self.u = u
+
+    def __iter__(self):
+        return iter(self.graph.neighbors(self.u).tolist())
+
+    def __len__(self):
+        return self.graph.degree(self.u)
+
+    def __bool__(self):
+        return self.graph.deg[self.u] > 0
+
+    def __contains__(self, v):
+        return self.graph.contains(self.u, v)
+
+    def add(self, v):
+        self.graph.add(self.u, v)
+
+    def remove(self, v):
+        if not self.graph.remove(self.u, v):
+            raise KeyError(v)
+
+    def discard(self, v):
+        self.graph.remove(self.u, v)
+
+    def clear(self):
+        self.graph.clear(self.u)
+
+    def __repr__(self):
+        return f"NeighborView({self.u}, {self.graph.neighbors(self.u).tolist()})"
@@ -0,0 +1,254 @@
+import asyncio
+import socket
+import struct
+import time
+from collections import OrderedDict
+import numpy as np
+from crypto_channel import open_job
+
+# Wire frame: exchange epoch, request seq, sender, receiver, piece, then the
+# lengths of the (iv, ciphertext, tag) fields that follow the header back to
+# back.
+FRAME = struct.Struct("!IIIIIBBI")
+
+def pack_frame(epoch, seq, sender, receiver, piece, iv, ciphertext, tag):
+    # A list of buffers for writelines, so the ciphertext is not copied.
+    return [FRAME.pack(epoch, seq, sender, receiver, piece, len(iv), len(tag), len(ciphertext)), iv, ciphertext, tag]
+
+async def read_frame(reader):
+    epoch, seq, sender, receiver, piece, iv_len, tag_len, ct_len = FRAME.unpack(await reader.readexactly(FRAME.size))
+    body = memoryview(await reader.readexactly(iv_len + ct_len + tag_len))
+    iv = body[:iv_len]
+    return epoch, seq, sender, receiver, piece, iv, body[iv_len:iv_len + ct_len], body[iv_len + ct_len:]
+
+class Link:
+    # A pooled connection and the number of senders currently using it.
+    __slots__ = ("ready", "users")
+
+    def __init__(self, ready):
+        self.ready = ready
+        self.users = 0
+
+    @property
+    def writer(self):
+        return self.ready.result()
+
+    def close(self):
+        self.writer.close()
+
+class LiveNetwork:
+    # Runs the batched engine's transfer phase over localhost TCP. Every
+    # LIVE_PEERS_PER_ENDPOINT peers share one listening endpoint, and frames
+    # travel on pooled connections per (sender endpoint, receiver endpoint)
+    # pair, least recently used closed past LIVE_MAX_CONNECTIONS. The
+    # receiving endpoint decrypts each frame as it arrives; outcomes are
+    # settled in request order once the round's frames are in, so trust
+    # evolves as under the batched engine whatever the arrival order. A frame
+    # lost to a socket error, or still missing LIVE_TIMEOUT seconds after the
+    # last send, fails its transfer without a trust change.
+    def __init__(self, sim):
+        self.sim = sim
+        self.cfg = sim.cfg
+        self.group = max(1, self.cfg.LIVE_PEERS_PER_ENDPOINT)
+        self.capacity = self.cfg.LIVE_MAX_CONNECTIONS
+        self.send_buffer = self.cfg.LIVE_SEND_BUFFER
+        self.timeout = self.cfg.LIVE_TIMEOUT
+        self.loop = asyncio.new_event_loop()
+        self.servers = []
+        self.ports = []
+        self.pool = OrderedDict()
+        self.idle = None
+        self.opened = 0
+        self.reused = 0
+        self.lost = 0
+        self.latencies = []
+        self.keys = []
+        self.sent = []
+        self.results = []
+        self.epoch = 0
+        self.outstanding = set()
+        self.done = None
+        self.loop.run_until_complete(self.start())
+
+    async def start(self):
+        self.idle = asyncio.Event()
+        for _ in range(-(-len(self.sim.ids) // self.group)):
+            server = await asyncio.start_server(self.serve, "127.0.0.1", 0)
+            self.servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+
+    def endpoint(self, pid):
+        return pid // self.group
+
+    async def serve(self, reader, writer):
+        # A reset connection drops the frames still in it; exchange() fails
+        # them at its timeout.
+        try:
+            while True:
+                epoch, seq, sender, receiver, piece, iv, ciphertext, tag = await read_frame(reader)
+                self.deliver(epoch, seq, iv, ciphertext, tag)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    def deliver(self, epoch, seq, iv, ciphertext, tag):
+        # Frames from an earlier, timed-out exchange or already given up on
+        # are dropped.
+        if epoch != self.epoch or seq not in self.outstanding:
+            return
+        plaintext, error = open_job((self.keys[seq], iv, ciphertext, tag))
+        self.sim.crypto.decrypts += 1
+        self.results[seq] = (ciphertext, plaintext, error)
+        self.latencies.append(time.perf_counter() - self.sent[seq])
+        self.resolve(seq)
+
+    def resolve(self, seq):
+        self.outstanding.discard(seq)
+        if not self.outstanding:
+            self.done.set()
+
+    def lose(self, seq):
+        if seq in self.outstanding:
+            self.lost += 1
+            self.resolve(seq)
+
+    async def connection(self, a, b):
+        # Senders racing for a new pair share one connect. A full pool evicts
+        # its least recently used idle connection, or waits for one to idle.
+        key = (a, b)
+        link = self.pool.get(key)
+        if link is None:
+            while self.capacity and len(self.pool) >= self.capacity and not self.evict():
+                self.idle.clear()
+                await self.idle.wait()
+            link = self.pool[key] = Link(asyncio.ensure_future(self.connect(b)))
+            self.opened += 1
+        else:
+            self.pool.move_to_end(key)
+            self.reused += 1
+        link.users += 1
+        try:
+            await link.ready
+        except OSError:
+            self.drop(key, link)
+            raise
+        return link
+
+    def drop(self, key, link):
+        # A failed connection leaves the pool; its other senders see the
+        # same error and reconnect on their next frame.
+        link.users -= 1
+        if self.pool.get(key) is link:
+            del self.pool[key]
+            if link.ready.done() and link.ready.exception() is None:
+                link.close()
+        if link.users == 0:
+            self.idle.set()
+
+    def evict(self):
+        for key, link in self.pool.items():
+            if link.users == 0:
+                del self.pool[key]
+                link.close()
+                return True
+        return False
+
+    def release(self, link):
+        link.users -= 1
+        if link.users == 0:
+            self.idle.set()
+
+    async def connect(self, b):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.ports[b])
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # The transport buffer is the send queue: drain() blocks a sender
+        # while more than send_buffer bytes are waiting for the socket.
+        writer.transport.set_write_buffer_limits(high=self.send_buffer)
+        return writer
+
+    async def send(self, a, frames):
+        for b, seq, frame in frames:
+            try:
+                link = await self.connection(a, b)
+            except OSError:
+                self.lose(seq)
+                continue
+            try:
+                self.sent[seq] = time.perf_counter()
+                link.writer.writelines(frame)
+                await link.writer.drain()
+            except OSError:
+                self.drop((a, b), link)
+                self.lose(seq)
+            else:
+                self.release(link)
+
+    async def exchange(self, reqs, wire, keys):
+        self.epoch += 1
+        self.keys = keys
+        self.sent = [0.0] * len(reqs)
+        self.results = [None] * len(reqs)
+        self.outstanding = set()
+        self.done = asyncio.Event()
+        outbox = {}
+        for i, ((s, r, piece_id), (iv, ciphertext, tag)) in enumerate(zip(reqs, wire)):
+            if iv is None:
+                continue
+            frame = pack_frame(self.epoch, i, s.id, r.id, piece_id, iv, ciphertext, tag)
+            outbox.setdefault(self.endpoint(s.id), []).append((self.endpoint(r.id), i, frame))
+            self.outstanding.add(i)
+        if not self.outstanding:
+            return
+        await asyncio.gather(*(self.send(a, frames) for a, frames in outbox.items()))
+        try:
+            await asyncio.wait_for(self.done.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            for seq in sorted(self.outstanding):
+                self.lose(seq)
+
+    def run_transfers(self):
+        sim = self.sim
+        reqs = sim.collect_requests()
+        sealed, keys = sim.crypto.encrypt_batch(
+            [(s.id, r.id, s.piece(piece_id)) for s, r, piece_id in reqs], sim.executor)
+        wire, _ = sim.tamper_batch(reqs, sealed, keys)
+        self.loop.run_until_complete(self.exchange(reqs, wire, keys))
+        for i, (s, r, piece_id) in enumerate(reqs):
+            ok = False
+            if self.results[i] is not None:
+                plaintext, ok = r.settle(*self.results[i][1:])
+                if ok:
+                    if not r.has_piece(piece_id):
+                        sim.useful_transfers += 1
+                    r.store_piece(piece_id, plaintext)
+            sim.logger.record("content", sim.round_counter, "transfer", s.id, r.id, piece_id, ok)
+            sim.rate(r.id, s.id, ok)
+        self.results = []
+
+    def stats(self):
+        lat = np.array(self.latencies) * 1e3
+        out = {"endpoints": len(self.ports), "opened": self.opened, "reused": self.reused, "frames": lat.size,
+               "lost": self.lost}
+        if lat.size:
+            p50, p90, p99 = np.percentile(lat, (50, 90, 99)).tolist()
+            out.update(p50_ms=round(p50, 3), p90_ms=round(p90, 3), p99_ms=round(p99, 3),
+                       max_ms=round(float(lat.max()), 3))
+        return out
+
+    async def shutdown(self):
+        for link in self.pool.values():
+            link.close()
+        for link in self.pool.values():
+            await link.writer.wait_closed()
+        self.pool.clear()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.run_until_complete(self.shutdown())
+        self.loop.close()
@@ -1,10 +1,43 @@
 import csv
 import os
 import datetime
+import numpy as np
+from config import SimulationConfig
+from trust_store import TrustStore
+
+CATEGORIES = ("crypto", "event", "neighbor", "content", "corruption", "hmac_fail",
+              "padding_fail", "accident", "uncoop", "snoop")
+
+LOG_GATES = {
+    "crypto": "LOG_CRYPTO",
+    "event": "LOG_EVENTS",
+    "neighbor": "LOG_NEIGHBORS",
+    "content": "LOG_CONTENT",
+    "corruption": "LOG_EVENTS",
+    "hmac_fail": "LOG_CRYPTO",
+    "padding_fail": "LOG_CRYPTO",
+    "accident": "LOG_EVENTS",
+    "uncoop": "LOG_EVENTS",
+    "snoop": "LOG_EVENTS",
+}
+
+MESSAGES = {
+    "transfer": "round {round}: {src}->{dst} piece {piece} success={outcome}",
+    "refuse": "round {round}: peer {src} refused upload for piece {piece}",
+    "ddos": "round {round}: malicious peer {src} DDoS burst",
+    "poison": "round {round}: malicious peer {src} poisoned a piece",
+    "metadata_snoop": "round {round}: snooper peer {src} metadata snooping",
+}
 
 class SimulationLogger:
-    def __init__(self):
-        self.trust_log = []
+    def __init__(self, sink=None, cfg=None, rng=None):
+        self.cfg = cfg or SimulationConfig()
+        self.sink = sink
+        self.counts = dict.fromkeys(CATEGORIES, 0)
+        self.enabled = {c: getattr(self.cfg, LOG_GATES[c]) for c in CATEGORIES}
+        self.sample_rates = {c: self.cfg.LOG_SAMPLE_RATES.get(c, 1.0) for c in CATEGORIES}
+        self.sample_rng = rng or self.cfg.make_rngs().logging
+        self.trust_store = None
         self.crypto_log = []
         self.event_log = []
         self.content_log = []
@@ -16,42 +49,82 @@ class SimulationLogger:
         self.uncoop_log = []
         self.snoop_log = []
         self.summary = {}
+        self.lists = {c: getattr(self, f"{c}_log") for c in CATEGORIES}
 
     def log_trust_snapshot(self, round_idx, trust_map):
-        row = {"round": round_idx}
-        for p, v in trust_map.items():
-            row[f"peer_{p}"] = v
-        self.trust_log.append(row)
+        if isinstance(trust_map, dict):
+            values = np.fromiter(trust_map.values(), dtype=np.float32, count=len(trust_map))
+            ids = trust_map.keys()
+        else:
+            values = trust_map
+            ids = range(len(trust_map))
+        if self.trust_store is None:
+            self.trust_store = TrustStore(ids, delta=self.cfg.TRUST_LOG_DELTA)
+        self.trust_store.append(round_idx, values)
+
+    def add(self, category, msg):
+        self.counts[category] += 1
+        if not self.enabled[category]:
+            return
+        if self.sink is not None:
+            self.sink.write(category, (-1, "msg", -1, -1, -1, msg))
+        else:
+            self.lists[category].append(msg)
+
+    def record(self, category, round_idx, kind, src=-1, dst=-1, piece=-1, outcome=""):
+        self.counts[category] += 1
+        if not self.enabled[category]:
+            return
+        rate = self.sample_rates[category]
+        if rate < 1.0 and outcome is not False and self.sample_rng.random() >= rate:
+            return
+        rec = (round_idx, kind, src, dst, piece, outcome)
+        if self.sink is not None:
+            self.sink.write(category, rec)
+        else:
+            self.lists[category].append(rec)
+
+    def render(self, item):
+        if isinstance(item, tuple):
+            round_idx, kind, src, dst, piece, outcome = item
+            return MESSAGES[kind].format(round=round_idx, src=src, dst=dst, piece=piece, outcome=outcome)
+        return str(item)
+
+    def tally(self, category, n):
+        self.counts[category] += n
+
+    def count(self, category):
+        return self.counts[category]
 
     def log_event(self, msg):
-        self.event_log.append(msg)
+        self.add("event", msg)
 
     def log_crypto(self, msg):
-        self.crypto_log.append(msg)
+        self.add("crypto", msg)
 
     def log_corruption(self, msg):
-        self.corruption_log.append(msg)
+        self.add("corruption", msg)
 
     def log_hmac_fail(self, msg):
-        self.hmac_fail_log.append(msg)
+        self.add("hmac_fail", msg)
 
     def log_padding_fail(self, msg):
-        self.padding_fail_log.append(msg)
+        self.add("padding_fail", msg)
 
     def log_accident(self, msg):
-        self.accident_log.append(msg)
+        self.add("accident", msg)
 
     def log_uncoop(self, msg):
-        self.uncoop_log.append(msg)
+        self.add("uncoop", msg)
 
     def log_snoop(self, msg):
-        self.snoop_log.append(msg)
+        self.add("snoop", msg)
 
     def log_neighbor(self, msg):
-        self.neighbor_log.append(msg)
+        self.add("neighbor", msg)
 
     def log_content(self, msg):
-        self.content_log.append(msg)
+        self.add("content", msg)
 
     def write_csv(self, path, rows):
         if not rows:
@@ -67,7 +140,11 @@ class SimulationLogger:
         if not os.path.exists(out_dir):
             os.makedirs(out_dir)
 
-        self.write_csv(os.path.join(out_dir, "trust_evolution.csv"), self.trust_log)
+        self.write_trust(out_dir)
+        if self.sink is not None:
+            self.sink.close()
+            self.write_summary(os.path.join(out_dir, "summary.txt"))
+            return
         self.write_list(os.path.join(out_dir, "crypto_log.txt"), self.crypto_log)
         self.write_list(os.path.join(out_dir, "event_log.txt"), self.event_log)
         self.write_list(os.path.join(out_dir, "neighbor_log.txt"), self.neighbor_log)
@@ -81,10 +158,21 @@ class SimulationLogger:
 
         self.write_summary(os.path.join(out_dir, "summary.txt"))
 
+    def write_trust(self, out_dir):
+        if self.trust_store is None:
+            return
+        fmt = self.cfg.TRUST_LOG_FORMAT
+        if fmt == "npy":
+            self.trust_store.write_npy(os.path.join(out_dir, "trust_evolution.npy"))
+        elif fmt == "delta":
+            self.trust_store.write_delta(os.path.join(out_dir, "trust_evolution.npz"))
+        else:
+            self.trust_store.write_csv(os.path.join(out_dir, "trust_evolution.csv"))
+
     def write_list(self, filename, data):
         with open(filename, "w") as f:
             for item in data:
-                f.write(str(item) + "\n")
+                f.write(self.render(item) + "\n")
 
     def add_summary(self, key, value):
         self.summary[key] = value
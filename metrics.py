@@ -1,47 +1,60 @@
+import numpy as np
+from peer import TYPE_NAMES
+
 class Metrics:
-    def __init__(self, peers, trust, logger, content):
+    def __init__(self, peers, trust, logger, content, reputation=None):
         self.peers = peers
         self.trust = trust
         self.logger = logger
         self.content = content
+        self.reputation = reputation
 
     def final_trust_distribution(self):
         dist = {}
-        for pid, score in self.trust.scores.items():
+        for pid, score in self.trust.items():
             dist[pid] = score
         return dist
 
     def count_isolated(self):
-        return sum(1 for x in self.trust.isolated.values() if x)
+        return self.trust.count_isolated()
 
     def avg_trust(self):
-        vals = list(self.trust.scores.values())
-        return sum(vals) / len(vals)
+        return self.trust.mean()
 
     def count_by_type(self):
         out = {"honest": 0, "malicious": 0, "snooper": 0, "uncoop": 0}
+        if hasattr(self.peers, "types_array"):
+            counts = np.bincount(self.peers.types_array(), minlength=len(TYPE_NAMES))
+            for code, name in enumerate(TYPE_NAMES):
+                out[name] = int(counts[code])
+            return out
         for p in self.peers.values():
             if p.type in out:
                 out[p.type] += 1
         return out
 
     def count_corruptions(self):
-        return len(self.logger.corruption_log)
+        return self.logger.count("corruption")
 
     def count_crypto_fails(self):
-        return len(self.logger.crypto_log)
+        return self.logger.count("crypto")
 
     def count_bad_hmac(self):
-        return len(self.logger.hmac_fail_log)
+        return self.logger.count("hmac_fail")
 
     def count_bad_padding(self):
-        return len(self.logger.padding_fail_log)
+        return self.logger.count("padding_fail")
 
     def count_snoop_events(self):
-        return len(self.logger.snoop_log)
+        return self.logger.count("snoop")
 
     def count_uncoop_events(self):
-        return len(self.logger.uncoop_log)
+        return self.logger.count("uncoop")
+
+    def reputation_share(self, name):
+        # Global trust mass held by peers of one type.
+        types = self.peers.types_array()
+        return float(self.reputation.global_trust()[types == TYPE_NAMES.index(name)].sum())
 
     def generate_summary(self):
         self.logger.add_summary("avg_trust", round(self.avg_trust(), 3))
@@ -55,3 +68,8 @@ class Metrics:
         t = self.count_by_type()
         for k, v in t.items():
             self.logger.add_summary(f"type_{k}", v)
+        if self.reputation is not None:
+            for k in t:
+                self.logger.add_summary(f"reputation_{k}", round(self.reputation_share(k), 4))
+            self.logger.add_summary("reputation_edges", self.reputation.edges())
+            self.logger.add_summary("reputation_iterations", self.reputation.iterations)
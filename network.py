@@ -1,66 +1,377 @@
-import random
-import config
+import math
+import numpy as np
+from config import SimulationConfig
+from graph import Graph
+import topology
+from trust_index import TrustIndex
 
 class Network:
-    def __init__(self, peers, trust):
+    supports_incremental = True
+
+    def __init__(self, peers, trust, cfg=None, rng=None, crypto=None):
         self.peers = peers
         self.trust = trust
+        self.crypto = crypto
+        self.cfg = cfg or SimulationConfig()
+        self.rng = rng or self.cfg.make_rngs().topology
+        self.rev = None
+        self.pending = []
+        self.deficit = set()
+        self.incremental = self.cfg.INCREMENTAL_REWIRING and self.supports_incremental
+        if self.incremental:
+            self.trust.add_listener(self.pending.append)
+        self.index = None
 
     def initialize_random_neighbors(self):
+        if self.cfg.TOPOLOGY != "random":
+            self.load_topology()
+            return
         ids = list(self.peers.keys())
         for pid, p in self.peers.items():
             other = [x for x in ids if x != pid]
-            random.shuffle(other)
-            k = random.randint(config.MIN_NEIGHBORS, config.MAX_NEIGHBORS)
+            self.rng.shuffle(other)
+            k = self.rng.randint(self.cfg.MIN_NEIGHBORS, self.cfg.MAX_NEIGHBORS)
             p.neighbors = set(other[:k])
+        if self.incremental:
+            self.build_reverse_index()
+        self.build_trust_index()
+
+    def load_topology(self):
+        n = max(self.peers) + 1 if self.peers else 0
+        g = topology.build(self.cfg, n, self.cfg.make_rngs().numpy("topology"))
+        for pid, p in self.peers.items():
+            p.neighbors = set(g.neighbors(pid).tolist())
+        if self.incremental:
+            self.build_reverse_index()
+        self.build_trust_index()
+
+    def build_reverse_index(self):
+        self.rev = {pid: set() for pid in self.peers}
+        for pid, p in self.peers.items():
+            for x in p.neighbors:
+                self.rev[x].add(pid)
+
+    def build_trust_index(self):
+        if self.cfg.NEIGHBOR_SELECTION == "trust":
+            self.index = TrustIndex(self.trust, self.cfg, self.rng)
+            self.index.build(self.peers)
 
     def pick_neighbor(self, pid):
         p = self.peers[pid]
         if not p.neighbors:
             return None
-        valid = [n for n in p.neighbors if not self.trust.isolated_state(n)]
+        if self.index is not None:
+            return self.index.pick(pid)
+        # Sorted so draws never depend on set layout, which is not preserved
+        # across a checkpoint.
+        valid = [n for n in sorted(p.neighbors) if not self.trust.isolated_state(n)]
         if not valid:
             return None
-        random.shuffle(valid)
+        self.rng.shuffle(valid)
         return valid[0]
 
     def rewire_isolated(self):
         for pid, p in self.peers.items():
             if self.trust.isolated_state(pid):
-                p.neighbors.clear()
+                self.unlink_all(p)
                 continue
             bad = [x for x in p.neighbors if self.trust.isolated_state(x)]
             for x in bad:
-                p.drop_neighbor(x)
-            if len(p.neighbors) < config.MIN_NEIGHBORS:
+                self.unlink(p, x)
+            if len(p.neighbors) < self.cfg.MIN_NEIGHBORS:
                 self.reconnect(pid)
 
     def reconnect(self, pid):
         p = self.peers[pid]
         if self.trust.isolated_state(pid):
             return
+        if self.index is not None:
+            cands = self.index.top_candidates(pid, p.neighbors, self.cfg.TRUST_TOPK)
+            self.rng.shuffle(cands)
+            for cand in cands:
+                if len(p.neighbors) >= self.cfg.MIN_NEIGHBORS:
+                    return
+                self.link(p, cand)
+            if len(p.neighbors) >= self.cfg.MIN_NEIGHBORS:
+                return
         ids = list(self.peers.keys())
-        random.shuffle(ids)
+        self.rng.shuffle(ids)
         for cand in ids:
             if cand != pid and cand not in p.neighbors:
                 if not self.trust.isolated_state(cand):
-                    p.add_neighbor(cand)
-                if len(p.neighbors) >= config.MIN_NEIGHBORS:
+                    self.link(p, cand)
+                if len(p.neighbors) >= self.cfg.MIN_NEIGHBORS:
                     break
 
     def dynamic_churn(self):
         for pid, p in self.peers.items():
-            if random.random() < 0.05:
+            if self.rng.random() < self.cfg.CHURN_PROB:
                 if p.neighbors:
-                    lst = list(p.neighbors)
-                    random.shuffle(lst)
-                    p.drop_neighbor(lst[0])
-            if len(p.neighbors) < config.MIN_NEIGHBORS:
+                    lst = sorted(p.neighbors)
+                    self.rng.shuffle(lst)
+                    self.unlink(p, lst[0])
+            if len(p.neighbors) < self.cfg.MIN_NEIGHBORS:
                 self.reconnect(pid)
 
+    def link(self, p, x):
+        p.add_neighbor(x)
+        if x != p.id:
+            if self.rev is not None:
+                self.rev[x].add(p.id)
+            if self.index is not None:
+                self.index.link(p.id, x)
+
+    def unlink(self, p, x):
+        p.drop_neighbor(x)
+        if self.rev is not None:
+            self.rev[x].discard(p.id)
+        if self.index is not None:
+            self.index.unlink(p.id, x)
+        if self.crypto is not None and p.id not in self.peers[x].neighbors:
+            self.crypto.release(p.id, x)
+
+    def unlink_all(self, p):
+        for x in p.neighbors:
+            if self.rev is not None:
+                self.rev[x].discard(p.id)
+            if self.index is not None:
+                self.index.unlink(p.id, x)
+            if self.crypto is not None and p.id not in self.peers[x].neighbors:
+                self.crypto.release(p.id, x)
+        p.neighbors.clear()
+
     def loop_cycle(self):
+        if self.rev is not None:
+            self.rewire_incremental()
+            self.rewire_preemptive()
+            self.churn_incremental()
+            self.fill_deficit()
+            return
         self.rewire_isolated()
+        self.rewire_preemptive()
         self.dynamic_churn()
 
+    def rewire_preemptive(self):
+        # Peers that dropped below REWIRING_THRESHOLD lose their in-links
+        # before they are isolated; the other ends reconnect to trusted peers.
+        if self.index is None or not self.index.suspect:
+            return
+        for x in sorted(self.index.suspect):
+            for y in sorted(self.index.rev[x]):
+                p = self.peers[y]
+                self.unlink(p, x)
+                if len(p.neighbors) < self.cfg.MIN_NEIGHBORS:
+                    self.reconnect(y)
+
+    def rewire_incremental(self):
+        # Only peers that crossed ISOLATION_THRESHOLD since the last cycle and
+        # the peers that point at them are touched. The trust listener holds
+        # self.pending.append, so the list is emptied in place.
+        pending = self.pending[:]
+        self.pending.clear()
+        for x in pending:
+            self.unlink_all(self.peers[x])
+            self.deficit.discard(x)
+            for y in sorted(self.rev[x]):
+                p = self.peers[y]
+                self.unlink(p, x)
+                if len(p.neighbors) < self.cfg.MIN_NEIGHBORS:
+                    self.deficit.add(y)
+
+    def churn_incremental(self):
+        for pid in bernoulli_indices(len(self.peers), self.cfg.CHURN_PROB, self.rng):
+            p = self.peers[pid]
+            if p.neighbors:
+                lst = sorted(p.neighbors)
+                self.unlink(p, lst[self.rng.randrange(len(lst))])
+                if len(p.neighbors) < self.cfg.MIN_NEIGHBORS:
+                    self.deficit.add(pid)
+
+    def fill_deficit(self):
+        for pid in sorted(self.deficit):
+            self.reconnect_sampled(pid)
+        self.deficit = {pid for pid in self.deficit
+                        if len(self.peers[pid].neighbors) < self.cfg.MIN_NEIGHBORS
+                        and not self.trust.isolated_state(pid)}
+
+    def reconnect_sampled(self, pid):
+        p = self.peers[pid]
+        if self.trust.isolated_state(pid):
+            return
+        n = len(self.peers)
+        for _ in range(4 * self.cfg.MIN_NEIGHBORS):
+            cand = self.rng.randrange(n)
+            if cand != pid and cand not in p.neighbors and not self.trust.isolated_state(cand):
+                self.link(p, cand)
+                if len(p.neighbors) >= self.cfg.MIN_NEIGHBORS:
+                    return
+        self.reconnect(pid)
+
     def __repr__(self):
         return f"Network(peers={len(self.peers)})"
+
+def bernoulli_indices(n, p, rng):
+    # Geometric skipping: O(hits) draws instead of one per index.
+    if p <= 0:
+        return
+    if p >= 1:
+        yield from range(n)
+        return
+    log_q = math.log(1.0 - p)
+    i = -1
+    while True:
+        i += int(math.log(1.0 - rng.random()) / log_q) + 1
+        if i >= n:
+            return
+        yield i
+
+class GraphNetwork(Network):
+    supports_incremental = False
+
+    def __init__(self, peers, trust, cfg=None, rng=None, crypto=None, np_rng=None):
+        super().__init__(peers, trust, cfg, rng, crypto)
+        if self.cfg.NEIGHBOR_SELECTION != "uniform":
+            raise ValueError("NEIGHBOR_SELECTION = 'trust' needs NETWORK_BACKEND = 'sets'")
+        self.np_rng = np_rng or self.cfg.make_rngs().numpy("topology")
+        self.n = max(peers) + 1 if peers else 0
+        self.graph = Graph(self.n, self.cfg.MAX_NEIGHBORS)
+        self.cut = np.zeros(self.n, dtype=bool)
+        self.allowed = None
+        self.attach()
+
+    def attach(self):
+        for pid, p in self.peers.items():
+            p.neighbors = self.graph.view(pid)
+
+    def initialize_random_neighbors(self):
+        if self.cfg.TOPOLOGY != "random":
+            self.graph = topology.build(self.cfg, self.n, self.np_rng)
+            self.attach()
+            return
+        n = self.n
+        k = self.np_rng.integers(self.cfg.MIN_NEIGHBORS, self.cfg.MAX_NEIGHBORS + 1, size=n)
+        k = np.minimum(k, n - 1)
+        src = np.repeat(np.arange(n), k)
+        # Draw from the n-1 other ids by shifting past the owner; duplicates are
+        # dropped by from_edges and topped up by fill_bulk.
+        dst = self.np_rng.integers(0, max(n - 1, 1), size=src.size)
+        dst = dst + (dst >= src)
+        self.graph = Graph.from_edges(n, src, dst)
+        self.attach()
+        self.fill_bulk(np.flatnonzero(self.graph.deg < k), k, None)
+
+    def pick_neighbor(self, pid):
+        g = self.graph
+        d = g.deg[pid]
+        if d == 0:
+            return None
+        s = g.start[pid]
+        iso = self.trust.isolated_state
+        for _ in range(4):
+            n = int(g.adj[s + self.rng.randrange(d)])
+            if not iso(n):
+                return n
+        valid = [n for n in g.neighbors(pid).tolist() if not iso(n)]
+        if not valid:
+            return None
+        return valid[self.rng.randrange(len(valid))]
+
+    def rewire_isolated(self):
+        # Isolation is permanent and fills never link to isolated peers, so
+        # only peers isolated since the last call need their edges cut.
+        mask = self.trust.isolated_mask()
+        new = mask & ~self.cut
+        if new.any():
+            ru, rv = self.graph.remove_masked(new)
+            self.release_edges(ru, rv)
+            self.cut |= new
+        self.fill_deficits(mask)
+
+    def release_edges(self, ru, rv):
+        if self.crypto is None:
+            return
+        for u, v in zip(ru.tolist(), rv.tolist()):
+            if not self.graph.contains(v, u):
+                self.crypto.release(u, v)
+
+    def fill_deficits(self, mask):
+        under = np.flatnonzero((self.graph.deg < self.cfg.MIN_NEIGHBORS) & ~mask)
+        if under.size:
+            self.fill_bulk(under, np.full(self.n, self.cfg.MIN_NEIGHBORS), mask)
+
+    def fill_bulk(self, rows, target, mask):
+        # Tops up every row in one shot: draw the missing number of candidates
+        # per row, reject self/existing/duplicate picks, append the rest, and
+        # retry the few rows still short.
+        g = self.graph
+        n = self.n
+        allowed = self.allowed_ids(mask)
+        for _ in range(8):
+            rows = rows[g.deg[rows] < target[rows]]
+            if rows.size == 0 or allowed.size < 2:
+                break
+            src = np.repeat(rows, target[rows] - g.deg[rows])
+            dst = allowed[self.np_rng.integers(0, allowed.size, size=src.size)]
+            ok = dst != src
+            ok &= ~g.has_edges(src, dst)
+            first = np.unique(src * n + dst, return_index=True)[1]
+            uniq = np.zeros(src.size, dtype=bool)
+            uniq[first] = True
+            ok &= uniq
+            g.add_edges(src[ok], dst[ok])
+        for pid in rows[g.deg[rows] < target[rows]].tolist():
+            self.fill(pid, int(target[pid]), mask)
+
+    def allowed_ids(self, mask):
+        # Isolation only grows, so the live id list changes exactly when the
+        # isolated count does.
+        if mask is None:
+            return np.arange(self.n)
+        k = int(np.count_nonzero(mask))
+        if self.allowed is None or self.allowed[0] != k:
+            self.allowed = (k, np.flatnonzero(~mask))
+        return self.allowed[1]
+
+    def fill(self, pid, target, isolated):
+        g = self.graph
+        if g.deg[pid] >= target:
+            return
+        tries = 4 * target
+        cands = self.np_rng.integers(0, self.n, size=tries).tolist()
+        for c in cands:
+            if isolated is not None and isolated[c]:
+                continue
+            g.add(pid, c)
+            if g.deg[pid] >= target:
+                return
+        ids = np.arange(self.n)
+        if isolated is not None:
+            ids = ids[~isolated]
+        for c in self.np_rng.permutation(ids).tolist():
+            g.add(pid, c)
+            if g.deg[pid] >= target:
+                return
+
+    def reconnect(self, pid):
+        if self.trust.isolated_state(pid):
+            return
+        self.fill(pid, self.cfg.MIN_NEIGHBORS, self.trust.isolated_mask())
+
+    def dynamic_churn(self):
+        # A Binomial count of churning peers drawn without replacement (the
+        # same law as one Bernoulli per peer, in O(hits) draws); each drops one
+        # neighbor chosen by random slot, then all deficits are filled in bulk.
+        g = self.graph
+        k = self.np_rng.binomial(self.n, self.cfg.CHURN_PROB)
+        rows = np.sort(self.np_rng.choice(self.n, k, replace=False))
+        rows = rows[g.deg[rows] > 0]
+        if rows.size:
+            cols = (self.np_rng.random(rows.size) * g.deg[rows]).astype(np.int64)
+            removed = g.remove_slots(rows, cols)
+            self.release_edges(rows, removed)
+        self.fill_deficits(self.trust.isolated_mask())
+
+def make_network(peers, trust, cfg, rngs, crypto=None):
+    if cfg.NETWORK_BACKEND == "graph":
+        return GraphNetwork(peers, trust, cfg, rngs.topology, crypto, rngs.numpy("topology"))
+    return Network(peers, trust, cfg, rngs.topology, crypto)
@@ -1,33 +1,218 @@
-import random
-import config
+import sys
+import numpy as np
+from config import SimulationConfig
+from availability import PieceAvailability
 
-class Peer:
-    def __init__(self, pid, ptype, trust_ref, crypto_ref):
-        self.id = pid
-        self.type = ptype
+TYPE_NAMES = ("honest", "malicious", "snooper", "uncoop")
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+HONEST, MALICIOUS, SNOOPER, UNCOOP = range(4)
+
+def assign_types(ids, cfg, rng):
+    total = len(ids)
+    m = int(total * cfg.PERCENT_MALICIOUS)
+    s = int(total * cfg.PERCENT_SNOOPER)
+    u = int(total * cfg.PERCENT_UNCOOP)
+    arr = ["malicious"] * m + ["snooper"] * s + ["uncoop"] * u
+    while len(arr) < total:
+        arr.append("honest")
+    rng.shuffle(arr)
+    return dict(zip(ids, arr))
+
+class PeerTable:
+    # Struct-of-arrays peer state indexed by peer id: one int8 type code and
+    # one quarantine flag per peer in bytearrays (numpy views via
+    # types_array/quarantined_array) and piece holdings in the availability
+    # bitfields. Peer objects are __slots__ views over one row.
+    def __init__(self, ids, types, trust_ref, crypto_ref, cfg=None, rngs=None, content=None):
+        self.cfg = cfg or SimulationConfig()
+        self.rngs = rngs or self.cfg.make_rngs()
+        self.ids = ids
         self.trust = trust_ref
         self.crypto = crypto_ref
+        self.content = content
+        n = max(ids) + 1 if len(ids) else 0
+        self.type_code = bytearray(n)
+        for pid in ids:
+            self.type_code[pid] = TYPE_CODES[types[pid]]
+        self.quarantine = bytearray(n)
+        self.availability = PieceAvailability(n, self.cfg.CONTENT_PIECES)
+        self.views = [None] * n
+        for pid in ids:
+            self.views[pid] = Peer(self, pid)
+
+    def __getstate__(self):
+        # Peer views are rebuilt on load, so only neighbor state is saved:
+        # the shared Graph behind graph-backend views, otherwise each set as
+        # a run of sorted ids in one flat array.
+        state = dict(self.__dict__)
+        del state["views"]
+        nbrs = [self.views[pid].neighbors for pid in self.ids]
+        if nbrs and hasattr(nbrs[0], "graph"):
+            state["neighbors"] = nbrs[0].graph
+        else:
+            counts = np.fromiter(map(len, nbrs), dtype=np.int64, count=len(nbrs))
+            flat = [x for nb in nbrs for x in sorted(nb)]
+            state["neighbors"] = (counts, np.array(flat, dtype=np.int64))
+        return state
+
+    def __setstate__(self, state):
+        nbrs = state.pop("neighbors")
+        self.__dict__.update(state)
+        self.views = [None] * len(self.type_code)
+        for pid in self.ids:
+            self.views[pid] = Peer(self, pid)
+        if isinstance(nbrs, tuple):
+            counts, flat = nbrs
+            parts = np.split(flat, np.cumsum(counts)[:-1]) if len(counts) else []
+            for pid, part in zip(self.ids, parts):
+                self.views[pid].neighbors = set(part.tolist())
+        else:
+            for pid in self.ids:
+                self.views[pid].neighbors = nbrs.view(pid)
+
+    def __getitem__(self, pid):
+        p = self.views[pid] if pid >= 0 else None
+        if p is None:
+            raise KeyError(pid)
+        return p
+
+    def __contains__(self, pid):
+        return 0 <= pid < len(self.views) and self.views[pid] is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def keys(self):
+        return self.ids
+
+    def values(self):
+        return (self.views[pid] for pid in self.ids)
+
+    def items(self):
+        return ((pid, self.views[pid]) for pid in self.ids)
+
+    def types_array(self):
+        return np.frombuffer(self.type_code, dtype=np.int8)
+
+    def quarantined_array(self):
+        return np.frombuffer(self.quarantine, dtype=np.bool_)
+
+    def cycle_behavior(self):
+        # Vectorized Peer.cycle_behavior over every peer.
+        mask = self.trust.isolated_mask()
+        q = np.frombuffer(self.quarantine, dtype=np.uint8)
+        q[:] = 0
+        q[:len(mask)] = mask
+
+    def nbytes(self):
+        out = len(self.type_code) + len(self.quarantine)
+        out += self.availability.bits.nbytes + self.availability.counts.nbytes
+        out += sys.getsizeof(self.views)
+        for p in self.views:
+            if p is not None:
+                out += sys.getsizeof(p) + sys.getsizeof(p.neighbors)
+        return out
+
+class PieceCache:
+    # Mapping view of one peer's availability bits; piece data is served
+    # from the shared content store.
+    __slots__ = ("table", "pid")
+
+    def __init__(self, table, pid):
+        self.table = table
+        self.pid = pid
+
+    def __contains__(self, piece_id):
+        return self.table.availability.has(self.pid, piece_id)
+
+    def __getitem__(self, piece_id):
+        if piece_id not in self:
+            raise KeyError(piece_id)
+        return self.table.content.get_piece(piece_id)
+
+    def __setitem__(self, piece_id, data):
+        self.table.availability.add(self.pid, piece_id)
+
+    def __delitem__(self, piece_id):
+        if not self.table.availability.remove(self.pid, piece_id):
+            raise KeyError(piece_id)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return np.flatnonzero(self.table.availability.held(self.pid)).tolist()
+
+    def clear(self):
+        self.table.availability.clear(self.pid)
+
+class Peer:
+    __slots__ = ("table", "id", "neighbors")
+
+    def __init__(self, table, pid):
+        self.table = table
+        self.id = pid
         self.neighbors = set()
-        self.cache = {}
-        self.quarantined = False
+
+    @property
+    def cfg(self):
+        return self.table.cfg
+
+    @property
+    def rngs(self):
+        return self.table.rngs
+
+    @property
+    def trust(self):
+        return self.table.trust
+
+    @property
+    def crypto(self):
+        return self.table.crypto
+
+    @property
+    def availability(self):
+        return self.table.availability
+
+    @property
+    def type(self):
+        return TYPE_NAMES[self.table.type_code[self.id]]
+
+    @property
+    def quarantined(self):
+        return self.table.quarantine[self.id] == 1
+
+    @quarantined.setter
+    def quarantined(self, value):
+        self.table.quarantine[self.id] = 1 if value else 0
+
+    @property
+    def cache(self):
+        return PieceCache(self.table, self.id)
 
     def is_honest(self):
-        return self.type == "honest"
+        return self.table.type_code[self.id] == HONEST
 
     def is_malicious(self):
-        return self.type == "malicious"
+        return self.table.type_code[self.id] == MALICIOUS
 
     def is_snooper(self):
-        return self.type == "snooper"
+        return self.table.type_code[self.id] == SNOOPER
 
     def is_uncooperative(self):
-        return self.type == "uncoop"
+        return self.table.type_code[self.id] == UNCOOP
 
     def isolated(self):
-        return self.trust.isolated_state(self.id)
+        return self.table.trust.isolated_state(self.id)
 
     def refuse(self):
-        if self.is_uncooperative() and random.random() < config.REFUSE_PROB:
+        if self.is_uncooperative() and self.rngs.transfers.random() < self.cfg.REFUSE_PROB:
             self.trust.uncoop(self.id)
             return True
         return False
@@ -35,7 +220,7 @@ class Peer:
     def snoop_cipher(self, ciphertext):
         if not self.is_snooper():
             return False
-        if random.random() < config.SNOOP_PROB:
+        if self.rngs.attacks.random() < self.cfg.SNOOP_PROB:
             self.trust.snoop(self.id)
             return True
         return False
@@ -43,25 +228,28 @@ class Peer:
     def corrupt_cipher(self, ciphertext):
         if not self.is_malicious():
             return ciphertext
-        if random.random() < config.CORRUPTION_PROB:
+        if self.rngs.attacks.random() < self.cfg.CORRUPTION_PROB:
             self.trust.corrupt(self.id)
             if len(ciphertext) > 0:
-                idx = random.randint(0, len(ciphertext)-1)
-                b = ciphertext[idx] ^ 0xFF
-                return ciphertext[:idx] + bytes([b]) + ciphertext[idx+1:]
+                ciphertext = writable(ciphertext)
+                idx = self.rngs.attacks.randint(0, len(ciphertext)-1)
+                ciphertext[idx] ^= 0xFF
         return ciphertext
 
     def accidental_corruption(self, ciphertext):
-        if random.random() < config.ACCIDENT_PROB:
+        if self.rngs.attacks.random() < self.cfg.ACCIDENT_PROB:
             self.trust.accident(self.id)
             if len(ciphertext) > 0:
-                idx = random.randint(0, len(ciphertext)-1)
-                b = ciphertext[idx] ^ 0x0F
-                return ciphertext[:idx] + bytes([b]) + ciphertext[idx+1:]
+                ciphertext = writable(ciphertext)
+                idx = self.rngs.attacks.randint(0, len(ciphertext)-1)
+                ciphertext[idx] ^= 0x0F
         return ciphertext
 
     def encrypt_piece(self, receiver_id, plaintext):
         iv, ciphertext, tag = self.crypto.encrypt_for(self.id, receiver_id, plaintext)
+        return self.tamper(iv, ciphertext, tag)
+
+    def tamper(self, iv, ciphertext, tag):
         if iv is None or ciphertext is None or tag is None:
             self.trust.crypto_fail(self.id)
             return None, None, None
@@ -74,17 +262,21 @@ class Peer:
             pass
         try:
             plaintext = self.crypto.decrypt_from(sender_id, self.id, iv, ciphertext, tag)
+        except ValueError as e:
+            return self.settle(None, str(e))
+        return self.settle(plaintext, None)
+
+    def settle(self, plaintext, error):
+        if error is None:
             self.trust.reward(self.id)
             return plaintext, True
-        except ValueError as e:
-            msg = str(e)
-            if "bad-hmac" in msg:
-                self.trust.bad_hmac(self.id)
-            elif "bad-padding" in msg:
-                self.trust.bad_padding(self.id)
-            else:
-                self.trust.crypto_fail(self.id)
-            return None, False
+        if "bad-hmac" in error:
+            self.trust.bad_hmac(self.id)
+        elif "bad-padding" in error:
+            self.trust.bad_padding(self.id)
+        else:
+            self.trust.crypto_fail(self.id)
+        return None, False
 
     def add_neighbor(self, pid):
         if pid != self.id:
@@ -99,7 +291,7 @@ class Peer:
             return False
         if self.quarantined:
             return False
-        if self.is_uncooperative() and random.random() < config.REFUSE_PROB:
+        if self.is_uncooperative() and self.rngs.transfers.random() < self.cfg.REFUSE_PROB:
             self.trust.uncoop(self.id)
             return False
         return True
@@ -118,18 +310,24 @@ class Peer:
         iv, ciphertext, tag = data
         plaintext, ok = self.decrypt_piece(sender.id, iv, ciphertext, tag)
         if ok:
-            self.cache[piece_id] = plaintext
+            self.store_piece(piece_id, plaintext)
         return ok
 
+    def store_piece(self, piece_id, data):
+        return self.table.availability.add(self.id, piece_id)
+
     def has_piece(self, piece_id):
-        return piece_id in self.cache
+        return self.table.availability.has(self.id, piece_id)
+
+    def piece(self, piece_id):
+        return self.table.content.get_piece(piece_id)
 
     def request_piece(self, sender, piece_id):
-        if piece_id not in sender.cache:
+        if not sender.has_piece(piece_id):
             return False
         if not sender.can_send():
             return False
-        data = sender.send_piece(self, piece_id, sender.cache[piece_id])
+        data = sender.send_piece(self, piece_id, sender.piece(piece_id))
         return self.receive_piece(sender, data, piece_id)
 
     def cycle_behavior(self):
@@ -140,3 +338,10 @@ class Peer:
 
     def __repr__(self):
         return f"Peer({self.id}, {self.type}, trust={self.trust.get(self.id):.2f})"
+
+def writable(buf):
+    # Sealed ciphertexts are bytearrays and are flipped in place; immutable
+    # payloads from other callers are copied once.
+    if isinstance(buf, bytearray):
+        return buf
+    return bytearray(buf)
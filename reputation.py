@@ -0,0 +1,127 @@
+import numpy as np
+from config import SimulationConfig
+
+class ReputationEngine:
+    # EigenTrust-style global trust. Receivers rate senders +1 per good
+    # transfer and -1 per refused, failed or tampered one; s_ij is the sum.
+    # Local trust c_ij = max(s_ij, 0) / sum_j max(s_ij, 0), and global trust
+    # is the fixed point of t = (1 - a) C^T t + a p, where p is uniform over
+    # the pre-trusted peers and raters with no positive ratings hand their
+    # mass to p.
+    #
+    # Edges are kept sorted by (ratee, rater) key: keys, rows (the rater) and
+    # s/spos side by side, with a column count per ratee, so C^T t is one
+    # gather and one np.add.reduceat, O(edges). update() folds in the
+    # round's ratings by binary search and a linear-time insert, adjusting
+    # the per-rater positive sums in place, then iterates from the previous
+    # vector until the L1 change falls below REPUTATION_TOL.
+    def __init__(self, n, pretrusted, cfg=None):
+        self.cfg = cfg or SimulationConfig()
+        self.n = n
+        self.alpha = self.cfg.REPUTATION_ALPHA
+        self.p = np.zeros(n)
+        pre = np.asarray(pretrusted, dtype=np.int64)
+        if pre.size:
+            self.p[pre] = 1.0 / pre.size
+        elif n:
+            self.p[:] = 1.0 / n
+        self.t = self.p.copy()
+        self.keys = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.s = np.empty(0, dtype=np.float32)
+        self.spos = np.empty(0, dtype=np.float32)
+        self.col_counts = np.zeros(n, dtype=np.int64)
+        self.colptr = np.zeros(n + 1, dtype=np.int64)
+        self.rowsum = np.zeros(n)
+        self.pending = ([], [], [])
+        self.pending_arrays = []
+        self.iterations = 0
+        self.residual = 0.0
+
+    def rate(self, rater, ratee, ok):
+        r, e, d = self.pending
+        r.append(rater)
+        e.append(ratee)
+        d.append(1.0 if ok else -1.0)
+
+    def rate_many(self, raters, ratees, delta):
+        if raters.size:
+            self.pending_arrays.append((raters, ratees, np.broadcast_to(delta, raters.shape)))
+
+    def take_pending(self):
+        parts = self.pending_arrays
+        r, e, d = self.pending
+        if r:
+            parts.append((np.array(r, dtype=np.int64), np.array(e, dtype=np.int64), np.array(d)))
+        self.pending = ([], [], [])
+        self.pending_arrays = []
+        if not parts:
+            return None
+        return tuple(np.concatenate([p[i] for p in parts]) for i in range(3))
+
+    def merge(self, raters, ratees, deltas):
+        n = self.n
+        key, inv = np.unique(ratees.astype(np.int64) * n + raters, return_inverse=True)
+        d = np.bincount(inv, weights=deltas, minlength=key.size)
+        pos = np.searchsorted(self.keys, key)
+        hit = pos < self.keys.size
+        hit[hit] = self.keys[pos[hit]] == key[hit]
+        at = pos[hit]
+        old = self.spos[at].astype(np.float64)
+        self.s[at] += d[hit].astype(np.float32)
+        self.spos[at] = np.maximum(self.s[at], 0)
+        np.add.at(self.rowsum, self.rows[at], self.spos[at] - old)
+        miss = ~hit
+        if miss.any():
+            nk, nd = key[miss], d[miss].astype(np.float32)
+            rows = (nk % n).astype(np.int32)
+            at = pos[miss]
+            self.keys = np.insert(self.keys, at, nk)
+            self.rows = np.insert(self.rows, at, rows)
+            self.s = np.insert(self.s, at, nd)
+            spos = np.maximum(nd, 0)
+            self.spos = np.insert(self.spos, at, spos)
+            np.add.at(self.rowsum, rows, spos)
+            self.col_counts += np.bincount(nk // n, minlength=n)
+            np.cumsum(self.col_counts, out=self.colptr[1:])
+        # Float sums of many +/- updates can leave tiny residues.
+        self.rowsum[self.rowsum < 1e-9] = 0.0
+
+    def step(self, t):
+        live = self.rowsum > 0
+        u = np.zeros(self.n)
+        np.divide(t, self.rowsum, out=u, where=live)
+        x = np.zeros(self.n)
+        nz = np.flatnonzero(self.col_counts)
+        if nz.size:
+            x[nz] = np.add.reduceat(self.spos * u[self.rows], self.colptr[nz])
+        dangling = t.sum() - t[live].sum()
+        return (1 - self.alpha) * (x + dangling * self.p) + self.alpha * self.p
+
+    def update(self):
+        # Returns the number of power iterations this round took.
+        batch = self.take_pending()
+        if batch is not None:
+            self.merge(*batch)
+        elif self.residual < self.cfg.REPUTATION_TOL:
+            return 0
+        return self.iterate()
+
+    def iterate(self):
+        t = self.t
+        iters = 0
+        for iters in range(1, self.cfg.REPUTATION_MAX_ITERS + 1):
+            nxt = self.step(t)
+            self.residual = float(np.abs(nxt - t).sum())
+            t = nxt
+            if self.residual < self.cfg.REPUTATION_TOL:
+                break
+        self.t = t
+        self.iterations += iters
+        return iters
+
+    def global_trust(self):
+        return self.t
+
+    def edges(self):
+        return self.keys.size
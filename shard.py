@@ -0,0 +1,497 @@
+import multiprocessing
+import time
+import traceback
+import zlib
+import numpy as np
+from config import SimulationConfig
+from peer import assign_types, TYPE_CODES, MALICIOUS, SNOOPER, UNCOOP
+from trust import ArrayTrustSystem
+from availability import PieceAvailability
+from graph import Graph
+from content import ContentManager
+from logger import SimulationLogger, CATEGORIES
+from metrics import Metrics
+import topology
+
+# The sharded engine runs the vector engine's round model with peers split
+# into contiguous id ranges. A shard owns its peers' trust scores, adjacency
+# rows and incoming transfers, and keeps replicas of the isolation mask and
+# piece availability. Random draws come from a counter-based hash of
+# (seed, stream, round, peer id) rather than a sequential generator, so a
+# peer draws the same numbers whichever shard owns it and the final metrics
+# do not depend on the shard count. Per round:
+#   step      transfers for owned receivers and the adversarial events; trust
+#             events are bucketed by the shard that owns the target peer
+#   apply     each shard replays the events routed to it (same keys as the
+#             vector engine) and adds every shard's new pieces
+#   maintain  newly isolated ids are broadcast; shards cut and refill rows
+# Shards are driven over multiprocessing Pipes (socket pairs), one message
+# per phase; the same protocol runs over multiprocessing.connection for
+# shards on other hosts.
+
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+MASK64 = (1 << 64) - 1
+
+def mix64(x):
+    # SplitMix64 finalizer, in place over a uint64 array.
+    t = x >> np.uint64(30)
+    x ^= t
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    np.right_shift(x, np.uint64(27), out=t)
+    x ^= t
+    x *= np.uint64(0x94D049BB133111EB)
+    np.right_shift(x, np.uint64(31), out=t)
+    x ^= t
+    return x
+
+def mix_int(x):
+    x &= MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def stream_key(seed, name, round_idx, *extra):
+    key = mix_int(seed + 0x9E3779B97F4A7C15 * (zlib.crc32(name.encode()) + 1))
+    for v in (round_idx,) + extra:
+        key = mix_int(key ^ (v & MASK64))
+    return key
+
+def uniforms(seed, name, round_idx, ids, *extra):
+    # One uniform in [0, 1) per id, a pure function of its arguments.
+    key = np.uint64(stream_key(seed, name, round_idx, *extra))
+    x = np.asarray(ids).astype(np.uint64)
+    x *= GOLDEN
+    x += key
+    x = mix64(x)
+    x >>= np.uint64(11)
+    return x * (1.0 / (1 << 53))
+
+def uniform(seed, name, round_idx):
+    return float(uniforms(seed, name, round_idx, np.zeros(1, dtype=np.int64))[0])
+
+class Shard:
+    def __init__(self, cfg, bounds, index, types):
+        self.cfg = cfg
+        self.seed = cfg.RANDOM_SEED
+        self.bounds = bounds
+        self.lo, self.hi = int(bounds[index]), int(bounds[index + 1])
+        self.m = self.hi - self.lo
+        self.types = types
+        self.n = len(types)
+        self.malicious = np.flatnonzero(types == MALICIOUS)
+        self.snoopers = np.flatnonzero(types == SNOOPER)
+        self.trust = ArrayTrustSystem(range(self.m), {}, cfg)
+        self.new_isolated = []
+        self.trust.add_listener(self.new_isolated.append)
+        self.isolated = np.zeros(self.n, dtype=bool)
+        self.allowed = None
+        self.avail = PieceAvailability(self.n, cfg.CONTENT_PIECES)
+        for pid in range(min(5, self.n)):
+            for i in range(min(5, cfg.CONTENT_PIECES)):
+                self.avail.add(pid, i)
+        self.tallies = dict.fromkeys(CATEGORIES, 0)
+        self.useful = 0
+        self.event_ids = []
+        self.event_deltas = []
+        self.event_keys = []
+        self.graph = Graph(self.m, cfg.MAX_NEIGHBORS)
+        self.build_graph()
+
+    def draw(self, name, round_idx, ids, *extra):
+        return uniforms(self.seed, name, round_idx, ids, *extra)
+
+    def owns(self, pid):
+        return self.lo <= pid < self.hi
+
+    def add_events(self, pids, delta, keys):
+        if pids.size:
+            self.event_ids.append(pids)
+            self.event_deltas.append(np.full(pids.size, delta))
+            self.event_keys.append(np.broadcast_to(keys, pids.shape))
+
+    def build_graph(self):
+        cfg = self.cfg
+        rows = np.arange(self.m)
+        if cfg.TOPOLOGY != "random":
+            full = topology.build(cfg, self.n, cfg.make_rngs().numpy("topology"))
+            r, pos = full.row_slots(rows + self.lo)
+            self.graph.add_edges(r - self.lo, full.adj[pos].astype(np.int64))
+            return
+        span = cfg.MAX_NEIGHBORS - cfg.MIN_NEIGHBORS + 1
+        k = cfg.MIN_NEIGHBORS + (self.draw("degree", -1, rows + self.lo) * span).astype(np.int64)
+        self.fill(rows, np.minimum(k, self.n - 1), -1, "init")
+
+    def allowed_ids(self):
+        k = int(np.count_nonzero(self.isolated))
+        if self.allowed is None or self.allowed[0] != k:
+            self.allowed = (k, np.flatnonzero(~self.isolated))
+        return self.allowed[1]
+
+    def fill(self, rows, target, round_idx, tag):
+        # GraphNetwork.fill_bulk with target aligned to rows and candidates
+        # keyed by (row id, slot) so a row's picks do not depend on the others.
+        g = self.graph
+        allowed = self.allowed_ids()
+        for attempt in range(8):
+            short = g.deg[rows] < target
+            rows, target = rows[short], target[short]
+            if rows.size == 0 or allowed.size < 2:
+                break
+            need = target - g.deg[rows]
+            src = np.repeat(rows, need)
+            slot = np.arange(src.size) - np.repeat(np.cumsum(need) - need, need)
+            u = self.draw(tag, round_idx, (src + self.lo) * self.cfg.MAX_NEIGHBORS + slot, attempt)
+            dst = allowed[(u * allowed.size).astype(np.int64)]
+            ok = dst != src + self.lo
+            ok &= ~g.has_edges(src, dst)
+            first = np.unique(src * self.n + dst, return_index=True)[1]
+            uniq = np.zeros(src.size, dtype=bool)
+            uniq[first] = True
+            ok &= uniq
+            g.add_edges(src[ok], dst[ok])
+
+    def pick_neighbors(self, rows, round_idx):
+        # VectorEngine.pick_neighbors over local rows, draws keyed by receiver.
+        g = self.graph
+        iso = self.isolated
+        ids = rows + self.lo
+        out = np.full(rows.size, -1, dtype=np.int64)
+        deg = g.deg[rows]
+        has = np.flatnonzero(deg > 0)
+        slot = g.start[rows[has]] + (self.draw("slot", round_idx, ids[has]) * deg[has]).astype(np.int64)
+        cand = g.adj[slot].astype(np.int64)
+        ok = ~iso[cand]
+        out[has[ok]] = cand[ok]
+        retry = has[~ok]
+        if retry.size == 0:
+            return out
+        r = rows[retry]
+        d = g.deg[r]
+        first = np.cumsum(d) - d
+        pos = np.repeat(g.start[r] - first, d) + np.arange(d.sum())
+        nb = g.adj[pos].astype(np.int64)
+        live = ~iso[nb]
+        cnt = np.add.reduceat(live.astype(np.int64), first)
+        k = (self.draw("slot_live", round_idx, ids[retry]) * cnt).astype(np.int64)
+        c = np.concatenate([[0], np.cumsum(live)])
+        idx = np.searchsorted(c, c[first] + k + 1) - 1
+        sel = cnt > 0
+        out[retry[sel]] = nb[idx[sel]]
+        return out
+
+    def step(self, round_idx):
+        self.run_transfers(round_idx)
+        self.inject_adversarial_events(round_idx)
+        ids = np.concatenate(self.event_ids) if self.event_ids else np.empty(0, dtype=np.int64)
+        deltas = np.concatenate(self.event_deltas) if self.event_ids else np.empty(0)
+        keys = np.concatenate(self.event_keys) if self.event_ids else np.empty(0, dtype=np.int64)
+        self.event_ids, self.event_deltas, self.event_keys = [], [], []
+        dest = np.searchsorted(self.bounds, ids, side="right") - 1
+        order = np.argsort(dest, kind="stable")
+        cuts = np.searchsorted(dest[order], np.arange(1, len(self.bounds) - 1))
+        routed = [(a, b, c) for a, b, c in zip(np.split(ids[order], cuts), np.split(deltas[order], cuts),
+                                               np.split(keys[order], cuts))]
+        tallies = {c: v for c, v in self.tallies.items() if v}
+        self.tallies = dict.fromkeys(CATEGORIES, 0)
+        useful, self.useful = self.useful, 0
+        return routed, self.additions, tallies, useful
+
+    def run_transfers(self, r):
+        cfg = self.cfg
+        rows = np.flatnonzero(~self.isolated[self.lo:self.hi])
+        piece = (self.draw("piece", r, rows + self.lo) * cfg.CONTENT_PIECES).astype(np.int64)
+        m = self.avail.counts[piece] > 0
+        rows, piece = rows[m], piece[m]
+        snd = self.pick_neighbors(rows, r)
+        recv = rows + self.lo
+        m = snd >= 0
+        recv, piece, snd = recv[m], piece[m], snd[m]
+        m = self.avail.has_many(snd, piece)
+        recv, piece, snd = recv[m], piece[m], snd[m]
+
+        uncoop = self.types[snd] == UNCOOP
+        refuse = uncoop & (self.draw("refuse", r, recv) < cfg.REFUSE_PROB)
+        self.add_events(snd[refuse], -cfg.TRUST_PENALTY_UNCOOP, recv[refuse] * 8)
+        self.tallies["uncoop"] += int(refuse.sum())
+        m = ~refuse
+        recv, piece, snd, uncoop = recv[m], piece[m], snd[m], uncoop[m]
+        self.tallies["content"] += recv.size
+
+        refuse = uncoop & (self.draw("refuse_send", r, recv) < cfg.REFUSE_PROB)
+        self.add_events(snd[refuse], -cfg.TRUST_PENALTY_UNCOOP, recv[refuse] * 8 + 1)
+        fail = ~refuse & (self.draw("crypto_fail", r, recv) < cfg.CRYPTO_FAIL_PROB)
+        self.add_events(snd[fail], -cfg.TRUST_PENALTY_CRYPTO_FAIL, recv[fail] * 8 + 2)
+        m = ~(refuse | fail)
+        recv, piece, snd = recv[m], piece[m], snd[m]
+
+        corrupt = (self.types[snd] == MALICIOUS) & (self.draw("corrupt", r, recv) < cfg.CORRUPTION_PROB)
+        self.add_events(snd[corrupt], -cfg.TRUST_PENALTY_CORRUPT, recv[corrupt] * 8 + 3)
+        accident = self.draw("accident", r, recv) < cfg.ACCIDENT_PROB
+        self.add_events(snd[accident], -cfg.TRUST_PENALTY_ACCIDENT, recv[accident] * 8 + 4)
+        snoop = (self.types[recv] == SNOOPER) & (self.draw("snoop", r, recv) < cfg.SNOOP_PROB)
+        self.add_events(recv[snoop], -cfg.TRUST_PENALTY_SNOOP, recv[snoop] * 8 + 5)
+        tampered = corrupt | accident
+        self.add_events(recv[tampered], -cfg.TRUST_PENALTY_BAD_HMAC, recv[tampered] * 8 + 6)
+        ok = ~tampered
+        self.add_events(recv[ok], cfg.TRUST_REWARD, recv[ok] * 8 + 6)
+        # Receivers are owned here, so each useful transfer is counted once;
+        # the pieces reach every replica in apply.
+        recv, piece = recv[ok], piece[ok]
+        self.useful += int(np.count_nonzero(~self.avail.has_many(recv, piece)))
+        self.additions = (recv, piece)
+
+    def inject_adversarial_events(self, r):
+        # The attacker choices are global draws every shard agrees on; only
+        # the owner of the chosen peer emits its events and tallies it.
+        cfg = self.cfg
+        end = self.n * 8
+        if self.malicious.size and uniform(self.seed, "ddos", r) < 0.08:
+            m = int(self.malicious[int(uniform(self.seed, "ddos_peer", r) * self.malicious.size)])
+            if self.owns(m):
+                hits = min(3, int(self.graph.deg[m - self.lo]))
+                self.add_events(np.full(hits, m), -cfg.TRUST_PENALTY_CORRUPT, end)
+                self.tallies["corruption"] += 1
+        if self.malicious.size and uniform(self.seed, "poison", r) < 0.05:
+            m = int(self.malicious[int(uniform(self.seed, "poison_peer", r) * self.malicious.size)])
+            if self.owns(m):
+                self.add_events(np.array([m]), -cfg.TRUST_PENALTY_CORRUPT, end + 1)
+                self.tallies["corruption"] += 1
+        if self.snoopers.size and uniform(self.seed, "metadata_snoop", r) < 0.07:
+            s = int(self.snoopers[int(uniform(self.seed, "snoop_peer", r) * self.snoopers.size)])
+            if self.owns(s):
+                if uniform(self.seed, "snoop_hit", r) < 0.6:
+                    self.add_events(np.array([s]), -cfg.TRUST_PENALTY_SNOOP, end + 2)
+                self.tallies["snoop"] += 1
+        ids = np.arange(self.lo, self.hi)
+        probed = ids[self.draw("probe", r, ids) < 0.15]
+        self.add_events(probed, -cfg.TRUST_PENALTY_ACCIDENT, end + 3)
+
+    def apply(self, ids, deltas, keys, add_recv, add_piece, want_scores):
+        self.new_isolated.clear()
+        if ids.size:
+            self.trust.apply_sequence(ids - self.lo, deltas, keys)
+        self.avail.add_many(add_recv, add_piece)
+        new = np.array(self.new_isolated, dtype=np.int64) + self.lo
+        return new, self.trust.scores.copy() if want_scores else None
+
+    def maintain(self, r, new_isolated):
+        # GraphNetwork.loop_cycle: cut edges to newly isolated peers, top up
+        # deficits, then churn one slot per churning row and top up again.
+        g = self.graph
+        if new_isolated.size:
+            mask = np.zeros(self.n, dtype=bool)
+            mask[new_isolated] = True
+            self.isolated |= mask
+            g.remove_masked(mask, mask[self.lo:self.hi])
+        self.fill_deficits(r, "rewire")
+        rows = np.arange(self.m)
+        rows = rows[(self.draw("churn", r, rows + self.lo) < self.cfg.CHURN_PROB) & (g.deg > 0)]
+        if rows.size:
+            cols = (self.draw("churn_slot", r, rows + self.lo) * g.deg[rows]).astype(np.int64)
+            g.remove_slots(rows, cols)
+        self.fill_deficits(r, "churn")
+
+    def fill_deficits(self, r, tag):
+        under = np.flatnonzero((self.graph.deg < self.cfg.MIN_NEIGHBORS) & ~self.isolated[self.lo:self.hi])
+        if under.size:
+            self.fill(under, np.full(under.size, self.cfg.MIN_NEIGHBORS), r, tag)
+
+    def state(self):
+        return self.trust.scores, self.trust.isolated
+
+class ShardError(Exception):
+    pass
+
+def serve(conn, cfg, bounds, index, types):
+    # Worker loop: one (method, args) request in, one reply out; None stops.
+    try:
+        shard = Shard(cfg, bounds, index, types)
+        conn.send(None)
+    except Exception:
+        conn.send(ShardError(traceback.format_exc()))
+        return
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        name, args = msg
+        try:
+            out = getattr(shard, name)(*args)
+        except Exception:
+            out = ShardError(traceback.format_exc())
+        conn.send(out)
+    conn.close()
+
+class LocalShard:
+    def __init__(self, cfg, bounds, index, types):
+        self.shard = Shard(cfg, bounds, index, types)
+        self.out = None
+
+    def submit(self, name, *args):
+        self.out = getattr(self.shard, name)(*args)
+
+    def result(self):
+        return self.out
+
+    def close(self):
+        pass
+
+class RemoteShard:
+    def __init__(self, ctx, cfg, bounds, index, types):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=serve, args=(child, cfg, bounds, index, types), daemon=True)
+        self.proc.start()
+        child.close()
+
+    def submit(self, name, *args):
+        self.conn.send((name, args))
+
+    def result(self):
+        try:
+            out = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"shard worker {self.proc.pid} exited with code {self.proc.exitcode}")
+        if isinstance(out, ShardError):
+            raise RuntimeError(f"shard worker failed:\n{out}")
+        return out
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join()
+        self.conn.close()
+
+class TypeTable:
+    # The slice of PeerTable that Metrics reads.
+    def __init__(self, types):
+        self.types = types
+
+    def types_array(self):
+        return self.types
+
+class ShardedSimulation:
+    def __init__(self, cfg=None):
+        from simulation import PHASES
+        self.cfg = cfg or SimulationConfig()
+        if self.cfg.PIECE_POLICY != "probe":
+            raise ValueError("the sharded engine only supports PIECE_POLICY = 'probe'")
+        if self.cfg.NEIGHBOR_SELECTION != "uniform":
+            raise ValueError("the sharded engine only supports NEIGHBOR_SELECTION = 'uniform'")
+        if self.cfg.TRUST_HALF_LIFE:
+            raise ValueError("the sharded engine does not support TRUST_HALF_LIFE")
+        if self.cfg.REPUTATION:
+            raise ValueError("the sharded engine does not support REPUTATION")
+        if self.cfg.CHECKPOINT_INTERVAL:
+            raise ValueError("the sharded engine does not support checkpoints")
+        n = self.cfg.NUM_PEERS
+        self.rngs = self.cfg.make_rngs()
+        types = assign_types(range(n), self.cfg, self.rngs.topology)
+        self.types = np.fromiter((TYPE_CODES[types[pid]] for pid in range(n)), dtype=np.int8, count=n)
+        del types
+        self.peers = TypeTable(self.types)
+        self.has_malicious = bool((self.types == MALICIOUS).any())
+        self.trust = ArrayTrustSystem(range(n), {}, self.cfg)
+        self.logger = SimulationLogger(None, self.cfg, self.rngs.logging)
+        self.content = ContentManager(self.rngs.attacks, self.cfg)
+        self.content.make_pieces(self.cfg.CONTENT_PIECES)
+        self.crypto = None
+        self.useful_transfers = 0
+        self.round_counter = 0
+        self.rounds_done = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        k = max(1, min(self.cfg.SHARDS, n))
+        self.bounds = np.linspace(0, n, k + 1).astype(np.int64)
+        if k == 1:
+            self.shards = [LocalShard(self.cfg, self.bounds, 0, self.types)]
+        else:
+            ctx = multiprocessing.get_context()
+            self.shards = [RemoteShard(ctx, self.cfg, self.bounds, i, self.types) for i in range(k)]
+            for s in self.shards:
+                s.result()
+
+    def call(self, name, args):
+        for s, a in zip(self.shards, args):
+            s.submit(name, *a)
+        return [s.result() for s in self.shards]
+
+    def run_round(self):
+        t = self.timings
+        r = self.round_counter
+        k = len(self.shards)
+        t0 = time.perf_counter()
+        steps = self.call("step", [(r,)] * k)
+        for _, _, tallies, useful in steps:
+            for c, v in tallies.items():
+                self.logger.tally(c, v)
+            self.useful_transfers += useful
+        # The poisoned piece is a global draw, so the coordinator's store
+        # tracks it the way VectorEngine poisons sim.content.
+        seed = self.cfg.RANDOM_SEED
+        if self.has_malicious and uniform(seed, "poison", r) < 0.05:
+            self.content.poison_piece(int(uniform(seed, "poison_piece", r) * self.cfg.CONTENT_PIECES))
+        t1 = time.perf_counter()
+        t["transfers"] += t1 - t0
+
+        add_recv = np.concatenate([s[1][0] for s in steps])
+        add_piece = np.concatenate([s[1][1] for s in steps])
+        args = []
+        for d in range(k):
+            parts = [s[0][d] for s in steps]
+            args.append(tuple(np.concatenate([p[i] for p in parts]) for i in range(3))
+                        + (add_recv, add_piece, self.cfg.LOG_TRUST))
+        applied = self.call("apply", args)
+        t2 = time.perf_counter()
+        t["adversarial"] += t2 - t1
+
+        new = np.concatenate([a[0] for a in applied])
+        self.trust.isolated[new] = True
+        self.call("maintain", [(r, new)] * k)
+        t3 = time.perf_counter()
+        t["network"] += t3 - t2
+
+        if self.cfg.LOG_TRUST:
+            self.trust.scores = np.concatenate([a[1] for a in applied])
+            self.logger.log_trust_snapshot(r, self.trust.scores)
+        t["logging"] += time.perf_counter() - t3
+
+    def run(self):
+        self.run_rounds()
+        self.finalize()
+
+    def run_rounds(self):
+        for r in range(self.rounds_done, self.cfg.NUM_ROUNDS):
+            self.round_counter = r
+            self.run_round()
+            self.rounds_done = r + 1
+
+    def collect(self):
+        if self.shards is None:
+            return
+        states = self.call("state", [()] * len(self.shards))
+        self.trust.scores = np.concatenate([s[0] for s in states])
+        self.trust.isolated = np.concatenate([s[1] for s in states])
+
+    def summarize(self):
+        self.collect()
+        m = Metrics(self.peers, self.trust, self.logger, self.content)
+        m.generate_summary()
+        return self.logger.summary
+
+    def close(self):
+        if self.shards is None:
+            return
+        self.collect()
+        for s in self.shards:
+            s.close()
+        self.shards = None
+
+    def finalize(self):
+        self.close()
+        self.summarize()
+        t0 = time.perf_counter()
+        self.logger.export_all(self.cfg.LOG_DIR)
+        self.timings["logging"] += time.perf_counter() - t0
+        for k, v in self.logger.summary.items():
+            print(f"{k}: {v}")
@@ -1,93 +1,253 @@
-import random
-import config
-from trust import TrustSystem
-from peer import Peer
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import checkpoint
+from config import SimulationConfig
+from trust import make_trust_system
+from peer import PeerTable, assign_types, HONEST
 from crypto_channel import CryptoManager
-from network import Network
+from network import make_network
 from content import ContentManager
+from availability import PieceScheduler
 from attack_models import AttackModels
-from logger import SimulationLogger
+from logger import SimulationLogger, CATEGORIES
+from event_sink import StreamingSink
 from metrics import Metrics
+from vector_engine import VectorEngine
+from reputation import ReputationEngine
+from live import LiveNetwork
+
+PHASES = ("transfers", "adversarial", "network", "reputation", "logging")
 
 class Simulation:
-    def __init__(self):
-        self.ids = list(range(config.NUM_PEERS))
+    def __init__(self, cfg=None):
+        self.cfg = cfg or SimulationConfig()
+        if self.cfg.ROUND_ENGINE == "vector":
+            self.cfg = self.cfg.replace(NETWORK_BACKEND="graph", TRUST_BACKEND="array")
+        self.rngs = self.cfg.make_rngs()
+        self.rng = self.rngs.transfers
+        self.ids = list(range(self.cfg.NUM_PEERS))
         self.types = self.assign_types()
-        self.trust = TrustSystem(self.ids, self.types)
-        self.crypto = CryptoManager()
-        self.logger = SimulationLogger()
-        self.peers = {pid: Peer(pid, self.types[pid], self.trust, self.crypto) for pid in self.ids}
-        self.network = Network(self.peers, self.trust)
-        self.content = ContentManager()
-        self.attacks = AttackModels(self.peers, self.trust, self.content)
+        self.trust = make_trust_system(self.ids, self.types, self.cfg)
+        self.crypto = CryptoManager(self.cfg, self.rngs.crypto)
+        self.logger = SimulationLogger(self.make_sink(), self.cfg, self.rngs.logging)
+        self.content = ContentManager(self.rngs.attacks, self.cfg)
+        self.peers = PeerTable(self.ids, self.types, self.trust, self.crypto, self.cfg, self.rngs, self.content)
+        vector = self.cfg.ROUND_ENGINE == "vector"
+        self.network = make_network(self.peers, self.trust, self.cfg, self.rngs, None if vector else self.crypto)
+        self.attacks = AttackModels(self.peers, self.trust, self.content, self.cfg, self.rngs.attacks)
         self.network.initialize_random_neighbors()
-        self.content.make_pieces(config.CONTENT_PIECES)
+        self.content.make_pieces(self.cfg.CONTENT_PIECES)
+        self.availability = self.peers.availability
         for pid in self.ids[:5]:
-            self.peers[pid].cache = {i: self.content.get_piece(i) for i in range(5)}
+            for i in range(5):
+                self.peers[pid].store_piece(i, self.content.get_piece(i))
+        self.scheduler = None
+        if self.cfg.PIECE_POLICY != "probe":
+            self.scheduler = PieceScheduler(self.availability, self.cfg.PIECE_POLICY, self.rng)
+        self.reputation = self.make_reputation()
+        self.useful_transfers = 0
         self.round_counter = 0
+        self.rounds_done = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.checkpoint_pid = None
+        self.executor = self.make_executor()
+        self.vector = VectorEngine(self) if vector else None
+        self.live = self.make_live()
+
+    def make_executor(self):
+        if self.cfg.ROUND_ENGINE in ("batched", "live") and self.cfg.CRYPTO_WORKERS > 0:
+            return ThreadPoolExecutor(max_workers=self.cfg.CRYPTO_WORKERS)
+        return None
+
+    def make_reputation(self):
+        if not self.cfg.REPUTATION:
+            return None
+        honest = np.flatnonzero(self.peers.types_array() == HONEST)
+        return ReputationEngine(len(self.ids), honest[:self.cfg.REPUTATION_PRETRUSTED], self.cfg)
+
+    def make_live(self):
+        return LiveNetwork(self) if self.cfg.ROUND_ENGINE == "live" else None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["executor"] = None
+        state["live"] = None
+        state["checkpoint_pid"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.executor = self.make_executor()
+        self.live = self.make_live()
+
+    def make_sink(self):
+        if self.cfg.LOG_SINK != "stream":
+            return None
+        c = self.cfg
+        return StreamingSink(c.LOG_DIR, CATEGORIES, c.LOG_BUFFER_RECORDS, c.LOG_WRITER_THREAD)
 
     def assign_types(self):
-        t = {}
-        total = len(self.ids)
-        m = int(total * config.PERCENT_MALICIOUS)
-        s = int(total * config.PERCENT_SNOOPER)
-        u = int(total * config.PERCENT_UNCOOP)
-        arr = ["malicious"] * m + ["snooper"] * s + ["uncoop"] * u
-        while len(arr) < total:
-            arr.append("honest")
-        random.shuffle(arr)
-        for i, pid in enumerate(self.ids):
-            t[pid] = arr[i]
-        return t
+        return assign_types(self.ids, self.cfg, self.rngs.topology)
 
     def run_round(self):
+        # Wall time per phase accumulates in self.timings; with the vector
+        # engine the round's trust updates are applied in the adversarial
+        # phase.
+        t = self.timings
+        t0 = time.perf_counter()
+        self.crypto.tick(self.round_counter)
+        self.trust.advance(self.round_counter)
+        if self.network.index is not None:
+            self.network.index.refresh_due()
+        if self.vector is not None:
+            self.vector.run_transfers()
+        elif self.live is not None:
+            self.live.run_transfers()
+        elif self.cfg.ROUND_ENGINE == "batched":
+            self.run_transfers_batched()
+        else:
+            self.run_transfers()
+        t1 = time.perf_counter()
+        t["transfers"] += t1 - t0
+
+        if self.vector is not None:
+            self.vector.inject_adversarial_events()
+            self.vector.apply_events()
+        else:
+            self.inject_adversarial_events()
+        t2 = time.perf_counter()
+        t["adversarial"] += t2 - t1
+
+        self.peers.cycle_behavior()
+
+        self.network.loop_cycle()
+        t3 = time.perf_counter()
+        t["network"] += t3 - t2
+
+        if self.reputation is not None:
+            self.reputation.update()
+            t4 = time.perf_counter()
+            t["reputation"] += t4 - t3
+            t3 = t4
+
+        if self.cfg.LOG_TRUST:
+            self.logger.log_trust_snapshot(self.round_counter, self.trust.snapshot())
+        t["logging"] += time.perf_counter() - t3
+
+    def run_transfers(self):
         for pid in self.ids:
             p = self.peers[pid]
             if p.isolated():
                 p.quarantined = True
                 continue
-            piece_id = random.choice(self.content.get_all_ids())
-            nbr = self.network.pick_neighbor(pid)
-            if nbr is None:
+            sender, piece_id = self.pick_transfer(p)
+            if sender is None:
                 continue
-            sender = self.peers[nbr]
             receiver = p
-            if not sender.has_piece(piece_id):
-                continue
             if sender.refuse():
-                self.logger.log_uncoop(f"round {self.round_counter}: peer {sender.id} refused upload for piece {piece_id}")
+                self.logger.record("uncoop", self.round_counter, "refuse", sender.id, receiver.id, piece_id)
+                self.rate(receiver.id, sender.id, False)
                 continue
-            data = sender.send_piece(receiver, piece_id, sender.cache[piece_id])
+            data = sender.send_piece(receiver, piece_id, sender.piece(piece_id))
+            useful = not receiver.has_piece(piece_id)
             ok = receiver.receive_piece(sender, data, piece_id)
-            if config.LOG_CONTENT:
-                self.logger.log_content(f"round {self.round_counter}: {sender.id}->{receiver.id} piece {piece_id} success={ok}")
+            if ok and useful:
+                self.useful_transfers += 1
+            self.logger.record("content", self.round_counter, "transfer", sender.id, receiver.id, piece_id, ok)
+            self.rate(receiver.id, sender.id, ok)
 
-        self.inject_adversarial_events()
+    def rate(self, receiver, sender, ok):
+        if self.reputation is not None:
+            self.reputation.rate(receiver, sender, ok)
 
+    def collect_requests(self):
+        reqs = []
         for pid in self.ids:
-            self.peers[pid].cycle_behavior()
+            p = self.peers[pid]
+            if p.isolated():
+                p.quarantined = True
+                continue
+            sender, piece_id = self.pick_transfer(p)
+            if sender is None:
+                continue
+            if sender.refuse():
+                self.logger.record("uncoop", self.round_counter, "refuse", sender.id, p.id, piece_id)
+                self.rate(p.id, sender.id, False)
+                continue
+            if not sender.can_send():
+                self.logger.record("content", self.round_counter, "transfer", sender.id, p.id, piece_id, False)
+                self.rate(p.id, sender.id, False)
+                continue
+            reqs.append((sender, p, piece_id))
+        return reqs
 
-        self.network.loop_cycle()
+    def pick_transfer(self, p):
+        # "probe" draws a random piece and a random live neighbor and gives
+        # up when the neighbor lacks it; other policies consult availability.
+        if self.scheduler is None:
+            piece_id = self.rng.choice(self.content.get_all_ids())
+            nbr = self.network.pick_neighbor(p.id)
+            if nbr is None or not self.peers[nbr].has_piece(piece_id):
+                return None, piece_id
+            return self.peers[nbr], piece_id
+        iso = self.trust.isolated_state
+        nbr, piece_id = self.scheduler.pick(p.id, [n for n in sorted(p.neighbors) if not iso(n)])
+        if nbr is None:
+            return None, None
+        return self.peers[nbr], piece_id
 
-        if config.LOG_TRUST:
-            self.logger.log_trust_snapshot(self.round_counter, self.trust.snapshot())
+    def run_transfers_batched(self):
+        # Phases: collect, encrypt (batched per channel), tamper/snoop hooks,
+        # decrypt (batched), then settle trust in request order. Decrypt
+        # outcomes take effect at the end of the transfer phase, not mid-round.
+        reqs = self.collect_requests()
+        sealed, keys = self.crypto.encrypt_batch(
+            [(s.id, r.id, s.piece(piece_id)) for s, r, piece_id in reqs], self.executor)
+        wire, jobs = self.tamper_batch(reqs, sealed, keys)
+        opened = iter(self.crypto.decrypt_batch(jobs, self.executor))
+        for i, (s, r, piece_id) in enumerate(reqs):
+            ok = False
+            if wire[i][0] is not None:
+                plaintext, ok = r.settle(*next(opened))
+                if ok:
+                    if not r.has_piece(piece_id):
+                        self.useful_transfers += 1
+                    r.store_piece(piece_id, plaintext)
+            self.logger.record("content", self.round_counter, "transfer", s.id, r.id, piece_id, ok)
+            self.rate(r.id, s.id, ok)
+
+    def tamper_batch(self, reqs, sealed, keys):
+        # Sender tamper and receiver snoop draws alternate per request, in the
+        # serial engine's order on the attacks stream.
+        wire = []
+        jobs = []
+        for (s, r, piece_id), data, k in zip(reqs, sealed, keys):
+            w = s.tamper(*data)
+            wire.append(w)
+            if w[0] is not None:
+                r.snoop_cipher(w[1])
+                jobs.append((k,) + w)
+        return wire, jobs
 
     def inject_adversarial_events(self):
-        if random.random() < 0.08:
+        if self.rngs.attacks.random() < 0.08:
             m = self.select_behavior("malicious")
             if m is not None:
                 self.attacks.ddos_burst(m)
-                self.logger.log_corruption(f"round {self.round_counter}: malicious peer {m} DDoS burst")
-        if random.random() < 0.05:
+                self.logger.record("corruption", self.round_counter, "ddos", m)
+        if self.rngs.attacks.random() < 0.05:
             m = self.select_behavior("malicious")
             if m is not None:
                 self.attacks.targeted_poison(m)
-                self.logger.log_corruption(f"round {self.round_counter}: malicious peer {m} poisoned a piece")
-        if random.random() < 0.07:
+                self.logger.record("corruption", self.round_counter, "poison", m)
+        if self.rngs.attacks.random() < 0.07:
             s = self.select_behavior("snooper")
             if s is not None:
                 self.attacks.metadata_snoop(s)
-                self.logger.log_snoop(f"round {self.round_counter}: snooper peer {s} metadata snooping")
+                self.logger.record("snoop", self.round_counter, "metadata_snoop", s)
         for pid in self.ids:
             self.attacks.adaptive_probe(pid)
 
@@ -95,21 +255,59 @@ class Simulation:
         cands = [pid for pid in self.ids if self.types[pid] == behavior_type]
         if not cands:
             return None
-        return random.choice(cands)
+        return self.rngs.attacks.choice(cands)
 
     def run(self):
-        for r in range(config.NUM_ROUNDS):
+        self.run_rounds()
+        self.finalize()
+
+    def run_rounds(self):
+        every = self.cfg.CHECKPOINT_INTERVAL
+        for r in range(self.rounds_done, self.cfg.NUM_ROUNDS):
             self.round_counter = r
             self.run_round()
-        self.finalize()
+            self.rounds_done = r + 1
+            if every and self.rounds_done % every == 0:
+                self.checkpoint()
 
-    def finalize(self):
-        m = Metrics(self.peers, self.trust, self.logger, self.content)
+    def checkpoint_path(self):
+        return self.cfg.CHECKPOINT_PATH or os.path.join(self.cfg.LOG_DIR, "checkpoint.pkl")
+
+    def checkpoint(self, path=None):
+        checkpoint.save(self, path or self.checkpoint_path(), self.cfg.CHECKPOINT_FORK)
+
+    def summarize(self):
+        m = Metrics(self.peers, self.trust, self.logger, self.content, self.reputation)
         m.generate_summary()
-        self.logger.export_all("logs")
+        return self.logger.summary
+
+    def close(self):
+        checkpoint.wait(self)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.live is not None:
+            self.live.close()
+
+    def finalize(self):
+        self.close()
+        self.summarize()
+        t0 = time.perf_counter()
+        self.logger.export_all(self.cfg.LOG_DIR)
+        self.timings["logging"] += time.perf_counter() - t0
         for k, v in self.logger.summary.items():
             print(f"{k}: {v}")
 
+def make_simulation(cfg=None):
+    cfg = cfg or SimulationConfig()
+    if cfg.ROUND_ENGINE == "sharded":
+        from shard import ShardedSimulation
+        return ShardedSimulation(cfg)
+    return Simulation(cfg)
+
 if __name__ == "__main__":
-    sim = Simulation()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--resume", default=None, help="continue from this checkpoint file")
+    args = ap.parse_args()
+    sim = checkpoint.load(args.resume) if args.resume else make_simulation()
     sim.run()
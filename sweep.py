@@ -0,0 +1,121 @@
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from config import SimulationConfig
+from simulation import make_simulation
+
+SWEEP_OVERRIDES = {
+    "LOG_TRUST": False,
+    "LOG_EVENTS": False,
+    "LOG_NEIGHBORS": False,
+    "LOG_CONTENT": False,
+    "LOG_CRYPTO": False,
+}
+
+def expand_grid(grid):
+    keys = list(grid.keys())
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+def make_tasks(overrides, seeds):
+    return [(i, dict(o), s) for i, o in enumerate(overrides) for s in seeds]
+
+def make_config(overrides, seed, point=0):
+    # Each grid point and seed gets its own LOG_DIR: a streaming sink
+    # truncates its files on open, and checkpoints are written there too.
+    params = dict(SWEEP_OVERRIDES)
+    params.update(overrides)
+    params["RANDOM_SEED"] = seed
+    cfg = SimulationConfig(**params)
+    return cfg.replace(LOG_DIR=os.path.join(cfg.LOG_DIR, f"sweep_{point}_seed{seed}"))
+
+def run_one(task):
+    point, overrides, seed = task
+    sim = make_simulation(make_config(overrides, seed, point))
+    sim.run_rounds()
+    sim.close()
+    row = {"seed": seed}
+    row.update(overrides)
+    row.update(sim.summarize())
+    return row
+
+def run_sweep(overrides, seeds, workers=None):
+    tasks = make_tasks(overrides, seeds)
+    if workers == 1:
+        return [run_one(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, tasks))
+
+def aggregate(rows, keys):
+    groups = {}
+    for r in rows:
+        groups.setdefault(tuple(r.get(k) for k in keys), []).append(r)
+    out = []
+    for gk, grp in groups.items():
+        agg = dict(zip(keys, gk))
+        agg["runs"] = len(grp)
+        for col, v in grp[0].items():
+            if col in keys or col == "seed" or not isinstance(v, (int, float)) or isinstance(v, bool):
+                continue
+            agg[f"mean_{col}"] = round(sum(r[col] for r in grp) / len(grp), 4)
+        out.append(agg)
+    return out
+
+def write_table(path, rows):
+    if not rows:
+        return
+    keys = []
+    for r in rows:
+        for k in r:
+            if k not in keys:
+                keys.append(k)
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=keys)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+def parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    if text in ("True", "False"):
+        return text == "True"
+    return text
+
+def parse_param(spec):
+    k, vals = spec.split("=", 1)
+    return k, [parse_value(v) for v in vals.split(",")]
+
+def parse_seeds(spec):
+    if ":" in spec:
+        lo, hi = spec.split(":", 1)
+        return list(range(int(lo), int(hi)))
+    return [int(s) for s in spec.split(",")]
+
+def add_arguments(ap):
+    ap.add_argument("--param", action="append", default=[], help="KEY=v1,v2,... (repeatable, forms a grid)")
+    ap.add_argument("--seeds", default="0:4", help="lo:hi range or comma list")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", default=os.path.join("logs", "sweep_results.csv"))
+
+def main(args):
+    grid = dict(parse_param(p) for p in args.param)
+    overrides = expand_grid(grid) if grid else [{}]
+    rows = run_sweep(overrides, parse_seeds(args.seeds), args.workers)
+    write_table(args.out, rows)
+    agg = aggregate(rows, list(grid.keys()))
+    write_table(args.out.replace(".csv", "_mean.csv"), agg)
+    for r in agg:
+        print(r)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    add_arguments(ap)
+    main(ap.parse_args())
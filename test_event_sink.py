@@ -0,0 +1,19 @@
+import pytest
+from event_sink import StreamingSink
+
+class BrokenFile:
+    def write(self, text):
+        raise OSError("disk full")
+
+    def close(self):
+        pass
+
+def test_writer_thread_error_reaches_producer(tmp_path):
+    sink = StreamingSink(str(tmp_path), ["content"], buffer_records=1, threaded=True, queue_size=1)
+    sink.files["content"] = BrokenFile()
+    with pytest.raises(OSError, match="disk full"):
+        for i in range(100):
+            sink.write("content", (i, "transfer", 0, 1, 2, True))
+    with pytest.raises(OSError, match="disk full"):
+        sink.close()
+    assert sink.thread is None
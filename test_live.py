@@ -0,0 +1,43 @@
+import live
+from config import SimulationConfig
+from simulation import Simulation
+
+def run_live(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cfg = SimulationConfig(ROUND_ENGINE="live", NUM_ROUNDS=6, LIVE_TIMEOUT=0.5, LOG_DIR=str(tmp_path))
+    sim = Simulation(cfg)
+    try:
+        sim.run_rounds()
+    finally:
+        sim.close()
+    return sim
+
+def test_reset_connection_fails_its_frames(tmp_path, monkeypatch):
+    read_frame = live.read_frame
+
+    async def flaky(reader):
+        frame = await read_frame(reader)
+        # frame[0] is the exchange epoch: every other round loses its frames.
+        if frame[0] % 2 == 0:
+            raise ConnectionResetError("reset by peer")
+        return frame
+
+    monkeypatch.setattr(live, "read_frame", flaky)
+    sim = run_live(tmp_path, monkeypatch)
+    stats = sim.live.stats()
+    assert stats["lost"] > 0
+    assert stats["frames"] > 0
+
+def test_refused_connection_fails_its_frames(tmp_path, monkeypatch):
+    connect = live.LiveNetwork.connect
+
+    async def refuse_odd(self, b):
+        if b % 2:
+            raise ConnectionRefusedError("refused")
+        return await connect(self, b)
+
+    monkeypatch.setattr(live.LiveNetwork, "connect", refuse_odd)
+    sim = run_live(tmp_path, monkeypatch)
+    stats = sim.live.stats()
+    assert stats["lost"] > 0
+    assert stats["frames"] > 0
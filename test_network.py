@@ -0,0 +1,26 @@
+import random
+from config import SimulationConfig
+from simulation import Simulation
+
+def test_incremental_rewiring_matches_full(tmp_path, monkeypatch):
+    # No churn and no refill, so the full rewire only cuts isolated peers
+    # and both modes must end with the same edges every cycle.
+    monkeypatch.chdir(tmp_path)
+    sims = [Simulation(SimulationConfig(INCREMENTAL_REWIRING=inc, CHURN_PROB=0.0, MIN_NEIGHBORS=0,
+                                        LOG_DIR=str(tmp_path / str(inc))))
+            for inc in (False, True)]
+    rng = random.Random(0)
+    for _ in range(5):
+        victims = rng.sample(sims[0].ids, 4)
+        for sim in sims:
+            for pid in victims:
+                sim.trust.penalize(pid, 10.0)
+            sim.network.loop_cycle()
+        full, inc = sims
+        for pid, p in inc.peers.items():
+            assert not any(inc.trust.isolated_state(x) for x in p.neighbors)
+            if inc.trust.isolated_state(pid):
+                assert not p.neighbors
+            assert set(p.neighbors) == set(full.peers[pid].neighbors)
+    for sim in sims:
+        sim.close()
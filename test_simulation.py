@@ -0,0 +1,29 @@
+import pickle
+from config import SimulationConfig
+from simulation import Simulation
+
+# Every transfer fails its MAC check and no event moves a score, so nothing
+# the serial engine settles mid-round can change a later request.
+STATIC = dict(ACCIDENT_PROB=1.0, SNOOP_PROB=0.5, CORRUPTION_PROB=0.5, TRUST_REWARD=0.0,
+              TRUST_PENALTY_BAD_HMAC=0.0, TRUST_PENALTY_BAD_PADDING=0.0, TRUST_PENALTY_CRYPTO_FAIL=0.0,
+              TRUST_PENALTY_CORRUPT=0.0, TRUST_PENALTY_SNOOP=0.0, TRUST_PENALTY_UNCOOP=0.0,
+              TRUST_PENALTY_ACCIDENT=0.0)
+
+def attack_events(sim, run):
+    events = []
+    for kind in ("snoop", "corrupt", "accident"):
+        fn = getattr(sim.trust, kind)
+        setattr(sim.trust, kind, lambda pid, fn=fn, kind=kind: (events.append((kind, pid)), fn(pid)))
+    run(sim)
+    return events
+
+def test_batched_draws_attacks_in_serial_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cfg = SimulationConfig(NUM_PEERS=200, NUM_ROUNDS=3, PIECE_POLICY="rarest", LOG_DIR=str(tmp_path), **STATIC)
+    sim = Simulation(cfg)
+    sim.run_rounds()
+    blob = pickle.dumps(sim)
+    serial = attack_events(pickle.loads(blob), Simulation.run_transfers)
+    batched = attack_events(pickle.loads(blob), Simulation.run_transfers_batched)
+    assert len(serial) > 20
+    assert batched == serial
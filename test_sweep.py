@@ -0,0 +1,6 @@
+import sweep
+
+def test_sweep_tasks_get_distinct_log_dirs():
+    tasks = sweep.make_tasks(sweep.expand_grid({"PERCENT_MALICIOUS": [0.1, 0.2]}), [0, 1])
+    dirs = {sweep.make_config(o, s, i).LOG_DIR for i, o, s in tasks}
+    assert len(dirs) == len(tasks)
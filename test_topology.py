@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from config import SimulationConfig
+from topology import build
+
+def edge_file(tmp_path, text):
+    path = tmp_path / "edges.txt"
+    path.write_text(text)
+    return str(path)
+
+def test_edge_list_drops_ids_past_peer_count(tmp_path):
+    cfg = SimulationConfig(TOPOLOGY="edgelist", TOPOLOGY_EDGE_FILE=edge_file(tmp_path, "# src dst\n0 1\n1 2\n2 7\n9 0\n"))
+    g = build(cfg, 3, np.random.default_rng(0))
+    assert g.neighbors(0).tolist() == [1]
+    assert g.neighbors(1).tolist() == [2]
+    assert g.neighbors(2).tolist() == []
+
+def test_edge_list_rejects_negative_ids(tmp_path):
+    cfg = SimulationConfig(TOPOLOGY="edgelist", TOPOLOGY_EDGE_FILE=edge_file(tmp_path, "0 1\n1 -1\n2 0\n"))
+    with pytest.raises(ValueError, match="negative peer id"):
+        build(cfg, 3, np.random.default_rng(0))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from config import SimulationConfig
+from simulation import Simulation
+from trust import TrustSystem, ArrayTrustSystem
+
+def run(tmp_path, seed, backend):
+    cfg = SimulationConfig().replace(RANDOM_SEED=seed, TRUST_BACKEND=backend, LOG_DIR=str(tmp_path / backend))
+    sim = Simulation(cfg)
+    sim.run_rounds()
+    sim.close()
+    return [float(v) for _, v in sim.trust.items()], sim.trust.count_isolated()
+
+@pytest.mark.parametrize("seed", range(12))
+def test_array_backend_matches_dict(tmp_path, monkeypatch, seed):
+    monkeypatch.chdir(tmp_path)
+    scores, isolated = run(tmp_path, seed, "dict")
+    assert run(tmp_path, seed, "array") == (scores, isolated)
+
+def apply_dict(trust, ids, deltas):
+    for pid, d in zip(ids, deltas):
+        if d > 0:
+            trust.reward(pid)
+        else:
+            trust.penalize(pid, -d)
+
+def test_apply_events_matches_dict_per_event():
+    cfg = SimulationConfig()
+    r = cfg.TRUST_REWARD
+    # 40 rewards past TRUST_MAX then a penalty; penalties into isolation
+    # followed by rewards that must be ignored.
+    ids = [0] * 41 + [1] * 14
+    deltas = [r] * 40 + [-0.45] + [-0.55] * 4 + [r] * 10
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        k = 400
+        ids += rng.integers(2, 30, k).tolist()
+        deltas += rng.choice([r, -0.3, -0.55, -1.0], k).tolist()
+    d = TrustSystem(range(30), {}, cfg)
+    a = ArrayTrustSystem(range(30), {}, cfg)
+    for lo in range(0, len(ids), 85):
+        apply_dict(d, ids[lo:lo + 85], deltas[lo:lo + 85])
+        a.apply_events(ids[lo:lo + 85], deltas[lo:lo + 85])
+    assert [d.get(pid) for pid in range(30)] == pytest.approx(a.scores.tolist(), abs=1e-12)
+    assert [d.isolated_state(pid) for pid in range(30)] == a.isolated.tolist()
+    assert d.isolated_state(1) and d.count_isolated() > 1
@@ -0,0 +1,35 @@
+import random
+import numpy as np
+from config import SimulationConfig
+from simulation import Simulation
+from trust_index import NeighborIndex
+
+def test_neighbor_index_total_tracks_weights():
+    rng = random.Random(0)
+    ix = NeighborIndex()
+    for x in range(40):
+        ix.append(x, rng.random())
+    for _ in range(5000):
+        x = rng.randrange(40)
+        if rng.random() < 0.1:
+            ix.remove(x)
+            ix.append(x, 0.0)
+        else:
+            ix.update(x, float(np.float32(rng.random() * 4)))
+    assert abs(ix.prefix(len(ix)) - sum(ix.w)) < 1e-9
+    for i in range(len(ix) + 1):
+        assert abs(ix.prefix(i) - sum(ix.w[:i])) < 1e-9
+
+def test_index_follows_decayed_scores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # TRUST_INITIAL inside the suspect band, so peers decay into it.
+    cfg = SimulationConfig(NEIGHBOR_SELECTION="trust", TRUST_HALF_LIFE=3, TRUST_INITIAL=3.8, LOG_DIR=str(tmp_path))
+    sim = Simulation(cfg)
+    sim.run_rounds()
+    sim.close()
+    idx = sim.network.index
+    for pid in sim.ids:
+        s = float(sim.trust.get(pid))
+        if s > cfg.ISOLATION_THRESHOLD:
+            assert idx.slot[pid][0] == idx.bucket(s)
+        assert (pid in idx.suspect) == (cfg.ISOLATION_THRESHOLD < s < cfg.REWIRING_THRESHOLD)
@@ -0,0 +1,102 @@
+import numpy as np
+from graph import Graph
+
+def symmetrize(src, dst):
+    return np.concatenate([src, dst]), np.concatenate([dst, src])
+
+def random_regular(n, d, rng, reciprocal=True):
+    # Configuration model: pair shuffled stubs; self-loops and repeated pairs
+    # are dropped by Graph.from_edges, so a few degrees come out below d.
+    stubs = np.repeat(np.arange(n, dtype=np.int64), d)
+    if stubs.size % 2:
+        stubs = stubs[:-1]
+    rng.shuffle(stubs)
+    src, dst = stubs[0::2], stubs[1::2]
+    if reciprocal:
+        return symmetrize(src, dst)
+    flip = rng.random(src.size) < 0.5
+    return np.where(flip, dst, src), np.where(flip, src, dst)
+
+def skip_sample(total, p, rng):
+    # Geometric skipping over [0, total): gaps between hits are Geometric(p).
+    if p <= 0 or total <= 0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(total, dtype=np.int64)
+    out = []
+    pos = -1
+    while pos < total:
+        gaps = rng.geometric(p, size=int((total - pos) * p * 1.1) + 64)
+        idx = pos + np.cumsum(gaps)
+        out.append(idx[idx < total])
+        pos = idx[-1]
+    return np.concatenate(out)
+
+def erdos_renyi(n, p, rng, reciprocal=False):
+    idx = skip_sample(n * (n - 1), p, rng)
+    src = idx // (n - 1)
+    r = idx % (n - 1)
+    dst = r + (r >= src)
+    if reciprocal:
+        keep = src < dst
+        return symmetrize(src[keep], dst[keep])
+    return src, dst
+
+def barabasi_albert(n, m, rng, reciprocal=True):
+    # Batagelj-Brandes: edge k of node k // m copies a uniformly chosen slot of
+    # the endpoint list written so far; odd slots are resolved by pointer jumping.
+    total = n * m
+    k = np.arange(total, dtype=np.int64)
+    r = (rng.random(total) * (2 * k + 1)).astype(np.int64)
+    cur = r.copy()
+    odd = np.flatnonzero(cur & 1)
+    while odd.size:
+        cur[odd] = r[(cur[odd] - 1) // 2]
+        odd = odd[(cur[odd] & 1) == 1]
+    src = k // m
+    dst = (cur // 2) // m
+    if reciprocal:
+        return symmetrize(src, dst)
+    return src, dst
+
+def watts_strogatz(n, k, beta, rng, reciprocal=True):
+    half = max(k // 2, 1)
+    src = np.repeat(np.arange(n, dtype=np.int64), half)
+    dst = (src + np.tile(np.arange(1, half + 1), n)) % n
+    rewire = rng.random(src.size) < beta
+    dst[rewire] = rng.integers(0, n, size=int(rewire.sum()))
+    if reciprocal:
+        return symmetrize(src, dst)
+    return src, dst
+
+def load_edge_list(path, reciprocal=False):
+    edges = np.loadtxt(path, dtype=np.int64, comments="#", ndmin=2)
+    if edges.size and edges.min() < 0:
+        row = int(np.flatnonzero((edges < 0).any(axis=1))[0])
+        raise ValueError(f"{path}: negative peer id in edge {edges[row].tolist()}")
+    src, dst = edges[:, 0], edges[:, 1]
+    if reciprocal:
+        return symmetrize(src, dst)
+    return src, dst
+
+def build(cfg, n, rng):
+    kind = cfg.TOPOLOGY
+    d = cfg.TOPOLOGY_DEGREE
+    rec = cfg.TOPOLOGY_RECIPROCAL
+    if kind == "regular":
+        src, dst = random_regular(n, d, rng, rec)
+    elif kind == "erdos_renyi":
+        p = cfg.TOPOLOGY_P if cfg.TOPOLOGY_P is not None else d / max(n - 1, 1)
+        src, dst = erdos_renyi(n, p, rng, rec)
+    elif kind == "barabasi_albert":
+        src, dst = barabasi_albert(n, max(d // 2, 1), rng, rec)
+    elif kind == "watts_strogatz":
+        src, dst = watts_strogatz(n, d, cfg.TOPOLOGY_REWIRE_PROB, rng, rec)
+    elif kind == "edgelist":
+        src, dst = load_edge_list(cfg.TOPOLOGY_EDGE_FILE, rec)
+        # Ids past the peer count are dropped, so a larger graph can be cut down.
+        keep = (src < n) & (dst < n)
+        src, dst = src[keep], dst[keep]
+    else:
+        raise ValueError(f"unknown topology {kind}")
+    return Graph.from_edges(n, src, dst)
@@ -1,78 +1,259 @@
-import config
+import numpy as np
+from config import SimulationConfig
+
+def decay_factor(cfg):
+    # Per-round decay toward TRUST_INITIAL. Decay never crosses
+    # ISOLATION_THRESHOLD when TRUST_INITIAL is above it, so isolation stays
+    # exact without reading the decayed scores.
+    if not cfg.TRUST_HALF_LIFE:
+        return None
+    if cfg.TRUST_INITIAL <= cfg.ISOLATION_THRESHOLD:
+        raise ValueError("TRUST_HALF_LIFE needs TRUST_INITIAL above ISOLATION_THRESHOLD")
+    return 0.5 ** (1.0 / cfg.TRUST_HALF_LIFE)
 
 class TrustSystem:
-    def __init__(self, peer_ids, types):
-        self.scores = {pid: config.TRUST_INITIAL for pid in peer_ids}
+    def __init__(self, peer_ids, types, cfg=None):
+        self.cfg = cfg or SimulationConfig()
+        self.scores = {pid: self.cfg.TRUST_INITIAL for pid in peer_ids}
         self.types = types
         self.isolated = {pid: False for pid in peer_ids}
+        self.listeners = []
+        self.watchers = []
+        self.round = 0
+        self.decay = decay_factor(self.cfg)
+        self.last = {pid: 0 for pid in peer_ids} if self.decay else None
 
     def clamp(self, v):
-        if v < config.TRUST_MIN:
-            return config.TRUST_MIN
-        if v > config.TRUST_MAX:
-            return config.TRUST_MAX
+        if v < self.cfg.TRUST_MIN:
+            return self.cfg.TRUST_MIN
+        if v > self.cfg.TRUST_MAX:
+            return self.cfg.TRUST_MAX
         return v
 
+    def advance(self, r):
+        # Scores decay from their last update to round r when next touched.
+        self.round = r
+
+    def current(self, pid):
+        # The decayed score, stored back so the decay is paid once; isolated
+        # peers keep the score they were isolated with.
+        v = self.scores[pid]
+        if self.decay is None or self.isolated[pid]:
+            return v
+        k = self.round - self.last[pid]
+        if k > 0:
+            base = self.cfg.TRUST_INITIAL
+            v = base + (v - base) * self.decay ** k
+            self.scores[pid] = v
+            self.last[pid] = self.round
+        return v
+
+    def decay_all(self):
+        if self.decay is not None:
+            for pid in self.scores:
+                self.current(pid)
+
     def reward(self, pid):
         if self.isolated[pid]:
             return
-        v = self.scores[pid] + config.TRUST_REWARD
+        v = self.current(pid) + self.cfg.TRUST_REWARD
         self.scores[pid] = self.clamp(v)
-        self.check_isolation(pid)
+        self.changed(pid)
 
     def penalize(self, pid, amt):
         if self.isolated[pid]:
             return
-        v = self.scores[pid] - amt
+        v = self.current(pid) - amt
         self.scores[pid] = self.clamp(v)
-        self.check_isolation(pid)
+        self.changed(pid)
 
     def bad_hmac(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_BAD_HMAC)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_BAD_HMAC)
 
     def bad_padding(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_BAD_PADDING)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_BAD_PADDING)
 
     def crypto_fail(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_CRYPTO_FAIL)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_CRYPTO_FAIL)
 
     def corrupt(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_CORRUPT)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_CORRUPT)
 
     def snoop(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_SNOOP)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_SNOOP)
 
     def uncoop(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_UNCOOP)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_UNCOOP)
 
     def accident(self, pid):
         if self.isolated[pid]:
             return
-        self.penalize(pid, config.TRUST_PENALTY_ACCIDENT)
+        self.penalize(pid, self.cfg.TRUST_PENALTY_ACCIDENT)
+
+    def changed(self, pid):
+        for fn in self.watchers:
+            fn(pid, self.scores[pid])
+        self.check_isolation(pid)
 
     def check_isolation(self, pid):
-        if self.scores[pid] <= config.ISOLATION_THRESHOLD:
-            self.isolated[pid] = True
+        if self.scores[pid] <= self.cfg.ISOLATION_THRESHOLD:
+            if not self.isolated[pid]:
+                self.isolated[pid] = True
+                for fn in self.listeners:
+                    fn(pid)
         else:
             self.isolated[pid] = False
 
+    def add_listener(self, fn):
+        self.listeners.append(fn)
+
+    def add_watcher(self, fn):
+        # fn(pid, score) runs after every score change, before the isolation
+        # check.
+        self.watchers.append(fn)
+
     def get(self, pid):
-        return self.scores[pid]
+        return self.current(pid)
 
     def isolated_state(self, pid):
         return self.isolated[pid]
 
+    def items(self):
+        self.decay_all()
+        return self.scores.items()
+
+    def count_isolated(self):
+        return sum(1 for x in self.isolated.values() if x)
+
+    def isolated_mask(self):
+        n = max(self.isolated) + 1 if self.isolated else 0
+        mask = np.zeros(n, dtype=bool)
+        for pid, iso in self.isolated.items():
+            if iso:
+                mask[pid] = True
+        return mask
+
+    def mean(self):
+        self.decay_all()
+        vals = list(self.scores.values())
+        return sum(vals) / len(vals)
+
     def snapshot(self):
+        self.decay_all()
         return dict(self.scores)
+
+class ArrayTrustSystem(TrustSystem):
+    def __init__(self, peer_ids, types, cfg=None, dtype=None):
+        self.cfg = cfg or SimulationConfig()
+        n = max(peer_ids) + 1 if len(peer_ids) else 0
+        self.scores = np.full(n, self.cfg.TRUST_INITIAL, dtype=dtype or self.cfg.TRUST_DTYPE)
+        self.types = types
+        self.isolated = np.zeros(n, dtype=bool)
+        self.listeners = []
+        self.watchers = []
+        self.round = 0
+        self.decay = decay_factor(self.cfg)
+        self.last = np.zeros(n, dtype=np.int64) if self.decay else None
+
+    def refresh(self, peers):
+        # current() for many peers at once.
+        if self.decay is None:
+            return
+        peers = peers[~self.isolated[peers]]
+        base = self.cfg.TRUST_INITIAL
+        k = self.round - self.last[peers]
+        self.scores[peers] = base + (self.scores[peers] - base) * np.power(self.decay, k)
+        self.last[peers] = self.round
+
+    def decay_all(self):
+        if self.decay is not None:
+            self.refresh(np.arange(self.scores.size))
+
+    def notify(self, peers, values):
+        for fn in self.watchers:
+            for pid, v in zip(peers.tolist(), values.tolist()):
+                fn(pid, v)
+
+    def apply_events(self, peer_ids, deltas):
+        # Events in the order given, with the per-event clamp and stop at
+        # isolation of reward/penalize, so a batch ends where the same calls
+        # on the dict backend would.
+        ids = np.asarray(peer_ids, dtype=np.intp)
+        self.apply_sequence(ids, deltas, np.arange(ids.size))
+
+    def apply_sequence(self, peer_ids, deltas, keys):
+        # Event-granular: each peer's events are replayed in `keys` order
+        # (ties in any order) with the per-event clamp of reward/penalize and
+        # stop at the first one that isolates the peer. Peers with a single
+        # event are updated in one step; the rest are sorted and replayed one
+        # event rank at a time, so the loop runs max-events-per-peer times.
+        ids = np.asarray(peer_ids, dtype=np.intp)
+        keep = ~self.isolated[ids]
+        ids = ids[keep]
+        if ids.size == 0:
+            return
+        keys = np.asarray(keys, dtype=np.int64)[keep]
+        self.refresh(ids)
+        d = np.asarray(deltas, dtype=np.float64)[keep]
+        multi = np.bincount(ids, minlength=self.scores.size)[ids] > 1
+        one = ~multi
+        hits = [self.replay(ids[one], d[one])]
+        if multi.any():
+            ids, d, keys = ids[multi], d[multi], keys[multi]
+            order = np.argsort(ids * (int(keys.max()) + 1) + keys)
+            ids, d = ids[order], d[order]
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            lens = np.diff(np.r_[starts, ids.size])
+            peers = ids[starts]
+            for j in range(int(lens.max())):
+                live = (lens > j) & ~self.isolated[peers]
+                hits.append(self.replay(peers[live], d[starts[live] + j]))
+        for pid in np.sort(np.concatenate(hits)).tolist():
+            for fn in self.listeners:
+                fn(pid)
+
+    def replay(self, peers, d):
+        # One event per peer; returns the peers it isolates.
+        v = np.clip(self.scores[peers] + d, self.cfg.TRUST_MIN, self.cfg.TRUST_MAX).astype(self.scores.dtype)
+        self.scores[peers] = v
+        self.notify(peers, v)
+        iso = v <= self.cfg.ISOLATION_THRESHOLD
+        self.isolated[peers] = iso
+        return peers[iso]
+
+    def items(self):
+        self.decay_all()
+        return enumerate(self.scores.tolist())
+
+    def count_isolated(self):
+        return int(np.count_nonzero(self.isolated))
+
+    def isolated_mask(self):
+        return self.isolated
+
+    def mean(self):
+        self.decay_all()
+        return float(self.scores.mean(dtype=np.float64))
+
+    def snapshot(self):
+        self.decay_all()
+        v = self.scores.view()
+        v.flags.writeable = False
+        return v
+
+def make_trust_system(peer_ids, types, cfg):
+    if cfg.TRUST_BACKEND == "array":
+        return ArrayTrustSystem(peer_ids, types, cfg)
+    return TrustSystem(peer_ids, types, cfg)
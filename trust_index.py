@@ -0,0 +1,230 @@
+import math
+
+class NeighborIndex:
+    # One peer's neighbors in slot order with a Fenwick tree over their
+    # weights, so a weight update, an append, a swap-remove and a weighted
+    # pick are each O(log d). The tree is rebuilt from the weights every
+    # REBUILD updates so rounding in the running sums cannot accumulate.
+    __slots__ = ("ids", "pos", "w", "tree", "updates")
+    REBUILD = 1024
+
+    def __init__(self):
+        self.ids = []
+        self.pos = {}
+        self.w = []
+        self.tree = [0.0]
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def prefix(self, i):
+        s = 0.0
+        tree = self.tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def add_at(self, i, delta):
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def append(self, x, weight):
+        if x in self.pos:
+            return
+        i = len(self.ids) + 1
+        self.tree.append(weight + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+        self.pos[x] = i - 1
+        self.ids.append(x)
+        self.w.append(weight)
+
+    def remove(self, x):
+        i = self.pos.pop(x, None)
+        if i is None:
+            return
+        last = len(self.ids) - 1
+        if i != last:
+            y = self.ids[last]
+            self.add_at(i, self.w[last] - self.w[i])
+            self.ids[i] = y
+            self.w[i] = self.w[last]
+            self.pos[y] = i
+        self.add_at(last, -self.w[last])
+        self.ids.pop()
+        self.w.pop()
+        self.tree.pop()
+
+    def update(self, x, weight):
+        i = self.pos[x]
+        old = self.w[i]
+        self.w[i] = weight
+        self.updates += 1
+        if self.updates >= self.REBUILD:
+            self.rebuild()
+        else:
+            self.add_at(i, weight - old)
+
+    def rebuild(self):
+        tree = self.tree = [0.0] + self.w
+        for i in range(1, len(tree)):
+            j = i + (i & -i)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self.updates = 0
+
+    def sample(self, u):
+        # Descends the tree to the slot holding u * total; None when every
+        # weight is zero.
+        total = self.prefix(len(self.ids))
+        if total <= 1e-12:
+            return None
+        target = u * total
+        tree = self.tree
+        i = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            j = i + step
+            if j < len(tree) and tree[j] <= target:
+                target -= tree[j]
+                i = j
+            step >>= 1
+        i = min(i, len(self.ids) - 1)
+        if self.w[i] <= 0:
+            # Rounding drift put the target on a zero-weight slot.
+            live = [k for k, w in enumerate(self.w) if w > 0]
+            i = min(live, key=lambda k: abs(k - i))
+        return self.ids[i]
+
+class TrustIndex:
+    # Trust-aware neighbor selection kept in step with the trust system:
+    #  - per peer, a NeighborIndex weighted by score - ISOLATION_THRESHOLD,
+    #    so isolated neighbors are never picked and near-isolated ones rarely;
+    #  - a histogram of live peers in TRUST_INDEX_BUCKETS equal score buckets,
+    #    so the top-k trusted candidates come from the highest buckets
+    #    without sorting the population (order within a bucket is random);
+    #  - the live peers below REWIRING_THRESHOLD, whose in-links the network
+    #    cuts before they reach isolation.
+    # Every score change costs O(in-degree * log d) plus O(1) bucket moves.
+    # With TRUST_HALF_LIFE, decay moves scores between events; each peer is
+    # re-read in the round its decayed score crosses the next bucket edge or
+    # REWIRING_THRESHOLD, so buckets, weights and suspects lag the score by
+    # less than one bucket width.
+    def __init__(self, trust, cfg, rng):
+        self.trust = trust
+        self.cfg = cfg
+        self.rng = rng
+        self.floor = cfg.ISOLATION_THRESHOLD
+        self.nbuckets = max(1, cfg.TRUST_INDEX_BUCKETS)
+        self.width = (cfg.TRUST_MAX - cfg.TRUST_MIN) / self.nbuckets
+        self.min_bucket = self.bucket(cfg.TRUST_THRESHOLD)
+        self.buckets = [[] for _ in range(self.nbuckets)]
+        self.slot = {}
+        self.nbrs = {}
+        self.rev = {}
+        self.suspect = set()
+        self.due = {}
+        self.next_due = {}
+        trust.add_watcher(self.on_score)
+
+    def bucket(self, score):
+        b = int((score - self.cfg.TRUST_MIN) / self.width)
+        return min(max(b, 0), self.nbuckets - 1)
+
+    def weight(self, score):
+        return score - self.floor if score > self.floor else 0.0
+
+    def build(self, peers):
+        for pid in peers:
+            self.rev[pid] = set()
+            self.on_score(pid, float(self.trust.get(pid)))
+        for pid, p in peers.items():
+            ix = NeighborIndex()
+            for x in sorted(p.neighbors):
+                ix.append(x, self.weight(float(self.trust.get(x))))
+                self.rev[x].add(pid)
+            self.nbrs[pid] = ix
+
+    def on_score(self, pid, score):
+        score = float(score)
+        w = self.weight(score)
+        for y in self.rev[pid]:
+            self.nbrs[y].update(pid, w)
+        self.place(pid, score)
+        if self.floor < score < self.cfg.REWIRING_THRESHOLD:
+            self.suspect.add(pid)
+        else:
+            self.suspect.discard(pid)
+        if self.trust.decay is not None:
+            self.schedule(pid, score)
+
+    def schedule(self, pid, score):
+        # The round decay next moves the score across an edge, from
+        # score(k) = base + (score - base) * decay ** k.
+        cfg = self.cfg
+        base = cfg.TRUST_INITIAL
+        b = self.bucket(score)
+        if score > base:
+            edges = [e for e in (cfg.TRUST_MIN + b * self.width, cfg.REWIRING_THRESHOLD) if base < e <= score]
+            edge = max(edges, default=None)
+        else:
+            edges = [e for e in (cfg.TRUST_MIN + (b + 1) * self.width, cfg.REWIRING_THRESHOLD) if score < e < base]
+            edge = min(edges, default=None)
+        if edge is None:
+            self.next_due.pop(pid, None)
+            return
+        k = max(1, math.ceil(math.log((edge - base) / (score - base)) / math.log(self.trust.decay)))
+        r = self.trust.round + k
+        self.next_due[pid] = r
+        self.due.setdefault(r, []).append(pid)
+
+    def refresh_due(self):
+        # Entries superseded by a later score event are skipped.
+        r = self.trust.round
+        for t in sorted(t for t in self.due if t <= r):
+            for pid in self.due.pop(t):
+                if self.next_due.get(pid) == t and not self.trust.isolated_state(pid):
+                    self.on_score(pid, self.trust.get(pid))
+
+    def place(self, pid, score):
+        old = self.slot.pop(pid, None)
+        if old is not None:
+            b, i = old
+            bucket = self.buckets[b]
+            last = bucket.pop()
+            if last != pid:
+                bucket[i] = last
+                self.slot[last] = (b, i)
+        if score > self.floor:
+            b = self.bucket(score)
+            self.slot[pid] = (b, len(self.buckets[b]))
+            self.buckets[b].append(pid)
+
+    def link(self, pid, x):
+        self.nbrs[pid].append(x, self.weight(float(self.trust.get(x))))
+        self.rev[x].add(pid)
+
+    def unlink(self, pid, x):
+        self.nbrs[pid].remove(x)
+        self.rev[x].discard(pid)
+
+    def pick(self, pid):
+        return self.nbrs[pid].sample(self.rng.random())
+
+    def top_candidates(self, pid, exclude, k):
+        # Walks the buckets down to TRUST_THRESHOLD, taking a whole bucket
+        # when it fits and a uniform sample of it otherwise.
+        out = []
+        for b in range(self.nbuckets - 1, self.min_bucket - 1, -1):
+            bucket = self.buckets[b]
+            need = k - len(out)
+            extra = len(exclude) + 1
+            if len(bucket) > need + extra:
+                bucket = [bucket[i] for i in self.rng.sample(range(len(bucket)), need + extra)]
+            out.extend(c for c in bucket if c != pid and c not in exclude)
+            if len(out) >= k:
+                return out[:k]
+        return out
@@ -0,0 +1,92 @@
+import csv
+import numpy as np
+
+class TrustStore:
+    def __init__(self, peer_ids, chunk_rounds=256, delta=False):
+        self.peer_ids = list(peer_ids)
+        self.num_peers = len(self.peer_ids)
+        self.chunk_rounds = chunk_rounds
+        self.delta = delta
+        self.chunks = []
+        self.rounds = []
+        self.fill = chunk_rounds
+        self.prev = None
+        self.delta_peers = []
+        self.delta_values = []
+
+    def append(self, round_idx, values):
+        row = np.asarray(values, dtype=np.float32)
+        self.rounds.append(round_idx)
+        if self.delta:
+            if self.prev is None:
+                idx = np.arange(self.num_peers, dtype=np.int32)
+                self.prev = row.copy()
+            else:
+                idx = np.flatnonzero(row != self.prev).astype(np.int32)
+                self.prev[idx] = row[idx]
+            self.delta_peers.append(idx)
+            self.delta_values.append(row[idx])
+            return
+        if self.fill == self.chunk_rounds:
+            self.chunks.append(np.empty((self.chunk_rounds, self.num_peers), dtype=np.float32))
+            self.fill = 0
+        self.chunks[-1][self.fill] = row
+        self.fill += 1
+
+    def __len__(self):
+        return len(self.rounds)
+
+    def iter_rows(self):
+        if self.delta:
+            cur = np.zeros(self.num_peers, dtype=np.float32)
+            for idx, vals in zip(self.delta_peers, self.delta_values):
+                cur[idx] = vals
+                yield cur
+            return
+        for i, chunk in enumerate(self.chunks):
+            n = self.fill if i == len(self.chunks) - 1 else self.chunk_rounds
+            for row in chunk[:n]:
+                yield row
+
+    def matrix(self):
+        out = np.empty((len(self), self.num_peers), dtype=np.float32)
+        for i, row in enumerate(self.iter_rows()):
+            out[i] = row
+        return out
+
+    def write_npy(self, path):
+        if not len(self):
+            return
+        mm = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(self), self.num_peers))
+        for i, row in enumerate(self.iter_rows()):
+            mm[i] = row
+        mm.flush()
+        del mm
+
+    def write_delta(self, path):
+        if not len(self):
+            return
+        counts = [len(x) for x in self.delta_peers] if self.delta else None
+        if self.delta:
+            peers = np.concatenate(self.delta_peers)
+            values = np.concatenate(self.delta_values)
+        else:
+            m = self.matrix()
+            changed = np.ones_like(m, dtype=bool)
+            changed[1:] = m[1:] != m[:-1]
+            counts = changed.sum(axis=1)
+            peers = np.nonzero(changed)[1].astype(np.int32)
+            values = m[changed]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        np.savez(path, rounds=np.asarray(self.rounds, dtype=np.int32), offsets=offsets,
+                 peers=peers, values=values, peer_ids=np.asarray(self.peer_ids))
+
+    def write_csv(self, path):
+        if not len(self):
+            return
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["round"] + [f"peer_{p}" for p in self.peer_ids])
+            for r, row in zip(self.rounds, self.iter_rows()):
+                w.writerow([r] + [f"{v:.7g}" for v in row.tolist()])
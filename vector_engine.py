@@ -0,0 +1,155 @@
+import numpy as np
+from peer import MALICIOUS, SNOOPER, UNCOOP
+
+class VectorEngine:
+    # One round as array operations over every live receiver: the transfer
+    # outcome of each step of Simulation.run_transfers (refusal, crypto
+    # failure, corruption, accident, snooping, HMAC rejection) is sampled as a
+    # Bernoulli mask instead of running real crypto. Trust deltas from the
+    # whole round, including the adversarial events, are replayed in
+    # reference order by one ArrayTrustSystem.apply_sequence call: transfer
+    # events are keyed by receiver id and step, adversarial events after them.
+    def __init__(self, sim):
+        if sim.cfg.PIECE_POLICY != "probe":
+            raise ValueError("the vector engine only supports PIECE_POLICY = 'probe'")
+        self.sim = sim
+        self.cfg = sim.cfg
+        self.rng = sim.rngs.numpy("transfers")
+        self.attack_rng = sim.rngs.numpy("attacks")
+        self.trust = sim.trust
+        self.network = sim.network
+        self.avail = sim.availability
+        self.logger = sim.logger
+        self.types = sim.peers.types_array()
+        self.n = len(self.types)
+        self.malicious = np.flatnonzero(self.types == MALICIOUS)
+        self.snoopers = np.flatnonzero(self.types == SNOOPER)
+        self.event_ids = []
+        self.event_deltas = []
+        self.event_keys = []
+
+    def add_events(self, pids, delta, keys):
+        if pids.size:
+            self.event_ids.append(pids)
+            self.event_deltas.append(np.full(pids.size, delta))
+            self.event_keys.append(np.broadcast_to(keys, pids.shape))
+
+    def rate(self, recv, snd, delta):
+        if self.sim.reputation is not None:
+            self.sim.reputation.rate_many(recv, snd, delta)
+
+    def run_round(self):
+        self.run_transfers()
+        self.inject_adversarial_events()
+        self.apply_events()
+
+    def apply_events(self):
+        if self.event_ids:
+            self.trust.apply_sequence(np.concatenate(self.event_ids), np.concatenate(self.event_deltas),
+                                      np.concatenate(self.event_keys))
+        self.event_ids = []
+        self.event_deltas = []
+        self.event_keys = []
+
+    def pick_neighbors(self, rows, iso):
+        # One uniform slot per row, accepted when the neighbor is live; rows
+        # that hit an isolated neighbor pick uniformly among their live
+        # neighbors, so every live neighbor has probability 1/live.
+        g = self.network.graph
+        out = np.full(rows.size, -1, dtype=np.int64)
+        deg = g.deg[rows]
+        has = np.flatnonzero(deg > 0)
+        slot = g.start[rows[has]] + (self.rng.random(has.size) * deg[has]).astype(np.int64)
+        cand = g.adj[slot].astype(np.int64)
+        ok = ~iso[cand]
+        out[has[ok]] = cand[ok]
+        retry = has[~ok]
+        if retry.size == 0:
+            return out
+        r = rows[retry]
+        d = g.deg[r]
+        first = np.cumsum(d) - d
+        pos = np.repeat(g.start[r] - first, d) + np.arange(d.sum())
+        nb = g.adj[pos].astype(np.int64)
+        live = ~iso[nb]
+        cnt = np.add.reduceat(live.astype(np.int64), first)
+        k = (self.rng.random(r.size) * cnt).astype(np.int64)
+        c = np.concatenate([[0], np.cumsum(live)])
+        idx = np.searchsorted(c, c[first] + k + 1) - 1
+        sel = cnt > 0
+        out[retry[sel]] = nb[idx[sel]]
+        return out
+
+    def run_transfers(self):
+        cfg = self.cfg
+        rng = self.rng
+        iso = self.trust.isolated.copy()
+        live = self.network.allowed_ids(iso)
+        # A probe for a piece nobody holds fails whichever neighbor it picks,
+        # so only the Binomial share of receivers whose uniform piece draw
+        # lands on a held piece is sampled.
+        held = np.flatnonzero(self.avail.counts > 0)
+        k = rng.binomial(live.size, held.size / cfg.CONTENT_PIECES)
+        recv = live[rng.choice(live.size, k, replace=False)]
+        piece = held[rng.integers(0, held.size, size=k)]
+        snd = self.pick_neighbors(recv, iso)
+        m = snd >= 0
+        recv, piece, snd = recv[m], piece[m], snd[m]
+        m = self.avail.has_many(snd, piece)
+        recv, piece, snd = recv[m], piece[m], snd[m]
+
+        uncoop = self.types[snd] == UNCOOP
+        refuse = uncoop & (rng.random(snd.size) < cfg.REFUSE_PROB)
+        self.add_events(snd[refuse], -cfg.TRUST_PENALTY_UNCOOP, recv[refuse] * 8)
+        self.rate(recv[refuse], snd[refuse], -1.0)
+        self.logger.tally("uncoop", int(refuse.sum()))
+        m = ~refuse
+        recv, piece, snd, uncoop = recv[m], piece[m], snd[m], uncoop[m]
+        self.logger.tally("content", recv.size)
+
+        # Peer.can_send draws a second refusal, then the channel may fail.
+        refuse = uncoop & (rng.random(snd.size) < cfg.REFUSE_PROB)
+        self.add_events(snd[refuse], -cfg.TRUST_PENALTY_UNCOOP, recv[refuse] * 8 + 1)
+        fail = ~refuse & (rng.random(snd.size) < cfg.CRYPTO_FAIL_PROB)
+        self.add_events(snd[fail], -cfg.TRUST_PENALTY_CRYPTO_FAIL, recv[fail] * 8 + 2)
+        m = ~(refuse | fail)
+        self.rate(recv[~m], snd[~m], -1.0)
+        recv, piece, snd = recv[m], piece[m], snd[m]
+
+        corrupt = (self.types[snd] == MALICIOUS) & (rng.random(snd.size) < cfg.CORRUPTION_PROB)
+        self.add_events(snd[corrupt], -cfg.TRUST_PENALTY_CORRUPT, recv[corrupt] * 8 + 3)
+        accident = rng.random(snd.size) < cfg.ACCIDENT_PROB
+        self.add_events(snd[accident], -cfg.TRUST_PENALTY_ACCIDENT, recv[accident] * 8 + 4)
+        snoop = (self.types[recv] == SNOOPER) & (rng.random(recv.size) < cfg.SNOOP_PROB)
+        self.add_events(recv[snoop], -cfg.TRUST_PENALTY_SNOOP, recv[snoop] * 8 + 5)
+        # Any flipped ciphertext byte fails the MAC check at the receiver.
+        tampered = corrupt | accident
+        self.add_events(recv[tampered], -cfg.TRUST_PENALTY_BAD_HMAC, recv[tampered] * 8 + 6)
+        ok = ~tampered
+        self.add_events(recv[ok], cfg.TRUST_REWARD, recv[ok] * 8 + 6)
+        self.rate(recv[tampered], snd[tampered], -1.0)
+        self.rate(recv[ok], snd[ok], 1.0)
+        self.sim.useful_transfers += self.avail.add_many(recv[ok], piece[ok])
+
+    def inject_adversarial_events(self):
+        # Same rates as Simulation.inject_adversarial_events / AttackModels.
+        cfg = self.cfg
+        a = self.attack_rng
+        end = self.n * 8
+        if a.random() < 0.08 and self.malicious.size:
+            m = self.malicious[a.integers(self.malicious.size)]
+            hits = min(3, int(self.network.graph.deg[m]))
+            self.add_events(np.full(hits, m), -cfg.TRUST_PENALTY_CORRUPT, end)
+            self.logger.tally("corruption", 1)
+        if a.random() < 0.05 and self.malicious.size:
+            m = self.malicious[a.integers(self.malicious.size)]
+            self.sim.content.poison_piece(int(a.integers(cfg.CONTENT_PIECES)))
+            self.add_events(np.array([m]), -cfg.TRUST_PENALTY_CORRUPT, end + 1)
+            self.logger.tally("corruption", 1)
+        if a.random() < 0.07 and self.snoopers.size:
+            s = self.snoopers[a.integers(self.snoopers.size)]
+            if a.random() < 0.6:
+                self.add_events(np.array([s]), -cfg.TRUST_PENALTY_SNOOP, end + 2)
+            self.logger.tally("snoop", 1)
+        probed = a.choice(self.n, a.binomial(self.n, 0.15), replace=False)
+        self.add_events(probed, -cfg.TRUST_PENALTY_ACCIDENT, end + 3)